@@ -0,0 +1,66 @@
+"""Micro-benchmark for draw_large_text in the .last match renderer.
+
+Compares the old per-pixel recolor loop with the single masked paste at
+scales 2-6 and checks both produce the same image.
+
+    python benchmarks/draw_large_text.py
+"""
+import os
+import sys
+import timeit
+
+from PIL import Image, ImageChops, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot'))
+
+from utils.match_render import FONT, draw_large_text  # noqa: E402
+
+TEXT = "Level 8 - 3rd Place"
+COLOR = '#c440da'
+RUNS = 200
+
+
+def legacy_draw_large_text(font, draw, text, x, y, color, scale=2):
+    """draw_large_text before the recolor was vectorized"""
+    text_bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = text_bbox[2] - text_bbox[0]
+    text_height = text_bbox[3] - text_bbox[1]
+    text_img = Image.new('RGBA', (text_width * scale, text_height * scale), (0, 0, 0, 0))
+    text_draw = ImageDraw.Draw(text_img)
+    text_draw.text((0, 0), text, font=font, fill='white')
+    text_img = text_img.resize((text_width * scale, text_height * scale), Image.NEAREST)
+    if color != 'white':
+        data = text_img.getdata()
+        new_data = []
+        for item in data:
+            if item[3] > 0:
+                if isinstance(color, str) and color.startswith('#'):
+                    r = int(color[1:3], 16)
+                    g = int(color[3:5], 16)
+                    b = int(color[5:7], 16)
+                    new_data.append((r, g, b, item[3]))
+                else:
+                    new_data.append((*color, item[3]))
+            else:
+                new_data.append(item)
+        text_img.putdata(new_data)
+    draw._image.paste(text_img, (x, y), text_img)
+
+
+def main():
+    print(f"{'scale':>5} {'legacy ms':>10} {'masked ms':>10} {'speedup':>8}")
+    for scale in range(2, 7):
+        legacy_img = Image.new('RGB', (600, 200), '#36393F')
+        masked_img = Image.new('RGB', (600, 200), '#36393F')
+        legacy_draw = ImageDraw.Draw(legacy_img)
+        masked_draw = ImageDraw.Draw(masked_img)
+
+        legacy = timeit.timeit(lambda: legacy_draw_large_text(FONT, legacy_draw, TEXT, 10, 10, COLOR, scale), number=RUNS)
+        masked = timeit.timeit(lambda: draw_large_text(masked_draw, TEXT, 10, 10, COLOR, scale), number=RUNS)
+
+        assert ImageChops.difference(legacy_img, masked_img).getbbox() is None, f"output differs at scale {scale}"
+        print(f"{scale:>5} {legacy / RUNS * 1000:>10.3f} {masked / RUNS * 1000:>10.3f} {legacy / masked:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import asyncio
+from discord.ext import commands, tasks
+
+
+class MessageArchiver(commands.Cog):
+    """Archives messages from the quote channels as they are posted.
+
+    Messages are buffered by the shared MessageArchive and written every
+    flush_seconds, or as soon as flush_rows are waiting. The hourly history
+    sync in main.py only has to fill gaps, like the time before the bot
+    (re)connected.
+    """
+
+    def __init__(self, bot, archive, flush_seconds=5):
+        self.bot = bot
+        self.archive = archive
+        self.flush_seconds = flush_seconds
+        self.flush_task = None
+
+    async def cog_load(self):
+        self.archive.reset_live()
+        self.flush_buffer.change_interval(seconds=self.flush_seconds)
+        self.flush_buffer.start()
+
+    async def cog_unload(self):
+        self.flush_buffer.cancel()
+        await self.archive.flush()
+
+    @tasks.loop(seconds=5)
+    async def flush_buffer(self):
+        await self.archive.flush()
+
+    def flush_soon(self):
+        # One size-triggered flush at a time; rows that arrive meanwhile wait for the next one
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.archive.flush())
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # A new session (not a resume) may have missed messages while disconnected
+        self.archive.reset_live()
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.channel.id not in self.archive.channels:
+            return
+        if self.archive.add(message) >= self.archive.flush_rows:
+            self.flush_soon()
+
+
+async def setup(bot, archive, flush_seconds=5):
+    await bot.add_cog(MessageArchiver(bot, archive, flush_seconds))
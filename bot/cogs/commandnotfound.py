@@ -1,61 +1,39 @@
 import discord
 from discord.ext import commands
 import psycopg2
-import os
 from datetime import datetime
 
 class CommandErrorHandler(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, database):
         self.bot = bot
-        self.conn = self.connect_to_db()
+        self.db = database
 
-    def create_unavailable_commands_table(self):
-        if self.conn is None:
-            print("No database connection.")
-            return
+    async def cog_load(self):
+        await self.db.run(self.create_unavailable_commands_table)
 
+    def create_unavailable_commands_table(self):
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS unavailable_commands (
-                    id SERIAL PRIMARY KEY,
-                    command TEXT NOT NULL,
-                    attempted_by BIGINT NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            self.conn.commit()
-            cursor.close()
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS unavailable_commands (
+                        id SERIAL PRIMARY KEY,
+                        command TEXT NOT NULL,
+                        attempted_by BIGINT NOT NULL,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
             print("Unavailable commands table checked/created.")
         except psycopg2.Error as e:
             print(f"Error creating unavailable commands table: {e}")
 
-    def connect_to_db(self):
-        DATABASE_URL = os.environ.get('DATABASE_URL')
-        try:
-            conn = psycopg2.connect(DATABASE_URL, sslmode='require')
-            print("Successfully connected to the database.")
-            self.conn = conn
-            self.create_unavailable_commands_table()  # Ensure table exists after connection
-            return conn
-        except psycopg2.Error as e:
-            print(f"Error connecting to the database: {e}")
-            return None
-
     def log_unavailable_command(self, command_name, user_id):
-        if self.conn is None:
-            print("No database connection.")
-            return
-
         try:
-            cursor = self.conn.cursor()
-            query = """
-                INSERT INTO unavailable_commands (command, attempted_by)
-                VALUES (%s, %s)
-            """
-            cursor.execute(query, (command_name, user_id))
-            self.conn.commit()
-            cursor.close()
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                query = """
+                    INSERT INTO unavailable_commands (command, attempted_by)
+                    VALUES (%s, %s)
+                """
+                cursor.execute(query, (command_name, user_id))
             print(f"Logged unavailable command: {command_name} by user {user_id}.")
         except psycopg2.Error as e:
             print(f"Error logging unavailable command: {e}")
@@ -65,7 +43,7 @@ class CommandErrorHandler(commands.Cog):
         # Check if the error is due to an unrecognized command
         if isinstance(error, commands.CommandNotFound):
             # Log the unavailable command
-            self.log_unavailable_command(ctx.message.content, ctx.author.id)  # Use ctx.author.id
+            await self.db.run(self.log_unavailable_command, ctx.message.content, ctx.author.id)  # Use ctx.author.id
 
             # Optionally send a response to the user (or handle it silently)
             print("That command is not available.")  # Send message or comment this line out if not needed
@@ -73,5 +51,5 @@ class CommandErrorHandler(commands.Cog):
             # Handle other command errors (if needed)
             raise error
 
-async def setup(bot):
-    await bot.add_cog(CommandErrorHandler(bot))
+async def setup(bot, database):
+    await bot.add_cog(CommandErrorHandler(bot, database))
@@ -19,6 +19,7 @@ class ShittyCommands(commands.Cog):
             'cutoffs': 'Challenger and Grandmaster Cutoffs for a specific region [.cutoffs NA]',
             'top': 'Look up the top 5 players in a region [.top na]',
             'roll': 'Simulate a shop roll at a specific level [.roll #]',
+            'odds': 'Chance to 3-star a unit [.odds ahri 7] or with copies out, owned and rolls [.odds ahri 7 3 0 40]',
             'malding': 'Send up to 3 random messages from the malding channel. Refreshes once an hour',
             'avp': 'Predict your average placement. Random integer between 1.0-8.0 [.avp for going fast 9]',
             'links': 'Large list of TFT resources to include webpages, discords, youtube and reddits',
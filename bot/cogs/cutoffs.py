@@ -1,14 +1,14 @@
 import discord
 from discord.ext import commands
-import aiohttp
 import difflib  # For matching regions
 import json
 import os
+from utils.riot import RiotAPIError
 
 class CutoffCommands(commands.Cog):
-    def __init__(self, bot, apikey, latest_version):
+    def __init__(self, bot, riot, latest_version):
         self.bot = bot
-        self.apikey = apikey
+        self.riot = riot
         self.latest_version = latest_version
         config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'cutoffs.json')
         with open(config_path, 'r') as config_file:
@@ -31,52 +31,39 @@ class CutoffCommands(commands.Cog):
             print(f"No valid region found for '{region_input}'. Please check the region name.")
             return
 
-        async with aiohttp.ClientSession() as session:
-            # Fetch Challenger + Grandmaster for Challenger cutoff
-            challenger_url = f"https://{closest_region}.api.riotgames.com/tft/league/v1/challenger?queue=RANKED_TFT&api_key={self.apikey}"
-            grandmaster_url = f"https://{closest_region}.api.riotgames.com/tft/league/v1/grandmaster?queue=RANKED_TFT&api_key={self.apikey}"
-
-            async with session.get(challenger_url) as challenger_response:
-                if challenger_response.status != 200:
-                    print(f"Failed to fetch Challenger data for {closest_region}.")
-                    return
-                challenger_data = await challenger_response.json()
-
-            async with session.get(grandmaster_url) as grandmaster_response:
-                if grandmaster_response.status != 200:
-                    print(f"Failed to fetch Grandmaster data for {closest_region}.")
-                    return
-                grandmaster_data = await grandmaster_response.json()
-
-            # Fetch Grandmaster + Master for Grandmaster cutoff
-            master_url = f"https://{closest_region}.api.riotgames.com/tft/league/v1/master?queue=RANKED_TFT&api_key={self.apikey}"
-
-            async with session.get(master_url) as master_response:
-                if master_response.status != 200:
-                    print(f"Failed to fetch Master data for {closest_region}.")
-                    return
-                master_data = await master_response.json()
-            # Combine Challenger and Grandmaster players for Challenger cutoff
-            combined_data = challenger_data['entries'] + grandmaster_data['entries'] + master_data['entries']
-            combined_data.sort(key=lambda x: x['leaguePoints'], reverse=True)
-
-            # Store player counts in the config
-            region_config = next((region for region in self.config['regions'] if region['region'] == closest_region), None)
-            if region_config:
-                challenger_players_count = region_config['num_challenger_players']
-                grandmaster_players_count = region_config['num_challenger_players'] + region_config['num_grandmaster_players']
-
-            # Challenger cutoff: 250th player
-            if len(combined_data) >= challenger_players_count:
-                challenger_cutoff = combined_data[challenger_players_count - 1]['leaguePoints']
-            else:
-                challenger_cutoff = combined_data[-1]['leaguePoints']
-
-            # Grandmaster cutoff: 750th player
-            if len(combined_data) >= grandmaster_players_count:
-                grandmaster_cutoff = combined_data[grandmaster_players_count - 1]['leaguePoints']
-            else:
-                grandmaster_cutoff = combined_data[-1]['leaguePoints']
+        # Fetch Challenger, Grandmaster and Master ladders for both cutoffs
+        ladders = {}
+        for tier in ('challenger', 'grandmaster', 'master'):
+            try:
+                ladders[tier] = await self.riot.get_league(closest_region, tier)
+            except RiotAPIError:
+                print(f"Failed to fetch {tier.capitalize()} data for {closest_region}.")
+                return
+        challenger_data = ladders['challenger']
+        grandmaster_data = ladders['grandmaster']
+        master_data = ladders['master']
+
+        # Combine Challenger and Grandmaster players for Challenger cutoff
+        combined_data = challenger_data['entries'] + grandmaster_data['entries'] + master_data['entries']
+        combined_data.sort(key=lambda x: x['leaguePoints'], reverse=True)
+
+        # Store player counts in the config
+        region_config = next((region for region in self.config['regions'] if region['region'] == closest_region), None)
+        if region_config:
+            challenger_players_count = region_config['num_challenger_players']
+            grandmaster_players_count = region_config['num_challenger_players'] + region_config['num_grandmaster_players']
+
+        # Challenger cutoff: 250th player
+        if len(combined_data) >= challenger_players_count:
+            challenger_cutoff = combined_data[challenger_players_count - 1]['leaguePoints']
+        else:
+            challenger_cutoff = combined_data[-1]['leaguePoints']
+
+        # Grandmaster cutoff: 750th player
+        if len(combined_data) >= grandmaster_players_count:
+            grandmaster_cutoff = combined_data[grandmaster_players_count - 1]['leaguePoints']
+        else:
+            grandmaster_cutoff = combined_data[-1]['leaguePoints']
 
         # Strip the number from the region (e.g., "na1" -> "na", "euw1" -> "euw")
         stripped_region = ''.join([char for char in closest_region if not char.isdigit()])
@@ -113,5 +100,5 @@ class CutoffCommands(commands.Cog):
         await ctx.send(embed=embed_gm)
 
 # Setup function for the cog
-async def setup(bot, apikey, latest_version):
-    await bot.add_cog(CutoffCommands(bot, apikey, latest_version))
+async def setup(bot, riot, latest_version):
+    await bot.add_cog(CutoffCommands(bot, riot, latest_version))
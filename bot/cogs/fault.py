@@ -1,56 +1,26 @@
 import discord
 from discord.ext import commands
-import psycopg2
-import os
 
 class FaultCommand(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, archive):
         self.bot = bot
-        self.conn = self.connect_to_db()
+        self.archive = archive
 
-    def connect_to_db(self):
-        DATABASE_URL = os.environ.get('DATABASE_URL')
+    async def fetch_random_fault_message(self):
         try:
-            return psycopg2.connect(DATABASE_URL, sslmode='require')
-        except psycopg2.Error as e:
-            print(f"Error connecting to the database: {e}")
-            return None
-
-    def fetch_random_fault_message(self):
-        if self.conn is None:
-            print("No database connection.")
-            return None
-
-        try:
-            cursor = self.conn.cursor()
-            query = """
-                SELECT content FROM (
-                    SELECT DISTINCT content, RANDOM() AS rand FROM general_messages WHERE content ILIKE '%is it even my fault%' AND author_id != 1285268322551726140
-                    UNION ALL
-                    SELECT DISTINCT content, RANDOM() AS rand FROM advice_messages WHERE content ILIKE '%is it even my fault%' AND author_id != 1285268322551726140
-                    UNION ALL
-                    SELECT DISTINCT content, RANDOM() AS rand FROM malding_messages WHERE content ILIKE '%is it even my fault%' AND author_id != 1285268322551726140
-                ) AS combined
-                ORDER BY rand
-                LIMIT 1;
-            """
-            cursor.execute(query)
-            result = cursor.fetchone()
-            cursor.close()
-            return result[0] if result else None
-        except psycopg2.Error as e:
+            return await self.archive.random_quote('is it even my fault', exclude_authors=[1285268322551726140])
+        except Exception as e:
             print(f"Error fetching fault message: {e}")
             return None
 
     @commands.command()
     async def myfault(self, ctx):
         # Fetch a random message containing 'is it even my fault'
-        random_message = self.fetch_random_fault_message()
-
+        random_message = await self.fetch_random_fault_message()
         if random_message:
             await ctx.send(random_message)
         else:
             print("No messages found containing 'is it even my fault'.")
 
-async def setup(bot):
-    await bot.add_cog(FaultCommand(bot))
+async def setup(bot, archive):
+    await bot.add_cog(FaultCommand(bot, archive))
@@ -1,20 +1,41 @@
 import discord
-from discord.ext import commands
-import aiohttp
+from discord.ext import commands, tasks
 import asyncio
+import heapq
 import os
-import urllib.parse
+import time
+from utils.riot import RiotAPIError
+
+# fetch_player_data result when a lookup failed, as opposed to None for a player with no ranked games
+FETCH_FAILED = object()
 
 class Leaderboard(commands.Cog):
-    def __init__(self, bot, apikey, set_number):
+    def __init__(self, bot, riot, database, set_number, leaderboard_config=None):
         self.bot = bot
-        self.apikey = apikey
+        self.riot = riot
+        self.db = database
         self.set_number = set_number
         self.tt_url = os.getenv('tt_url')
+        self.max_concurrent_players = 10
         # List of Discord IDs to ignore in leaderboard
         self.ignored_users = [
             729465001915711488
         ]
+        # Rate budget for the background refresher: this many players every refresh_seconds
+        leaderboard_config = leaderboard_config or {}
+        self.players_per_refresh = leaderboard_config.get('players_per_refresh', 10)
+        self.refresh_seconds = leaderboard_config.get('refresh_seconds', 60)
+        # Minimum seconds between edits of the status message during a full build
+        self.progress_seconds = leaderboard_config.get('progress_seconds', 2)
+        self.tables_ready = False
+        self.build_lock = asyncio.Lock()
+
+    async def cog_load(self):
+        self.refresh_snapshot.change_interval(seconds=self.refresh_seconds)
+        self.refresh_snapshot.start()
+
+    async def cog_unload(self):
+        self.refresh_snapshot.cancel()
 
     def get_rank_value(self, tier, rank, league_points):
         """Helper function to convert rank to a numeric value for sorting"""
@@ -46,9 +67,315 @@ class Leaderboard(commands.Cog):
             return f"{tier.capitalize()} ({league_points} LP)"
         return f"{tier.capitalize()} {rank} ({league_points} LP)"
 
+    def create_tables(self, conn):
+        """Create the materialized ranking table if it doesn't exist.
+
+        `updated_at` is when the row's rank data was last written and `checked_at`
+        when the refresher last looked the player up, successfully or not.
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS leaderboard_snapshot (
+                    discord_id BIGINT PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    tier VARCHAR(20),
+                    rank VARCHAR(5),
+                    lp INTEGER,
+                    games INTEGER,
+                    win_rate REAL,
+                    top4_rate REAL,
+                    rank_value INTEGER,
+                    updated_at TIMESTAMPTZ DEFAULT NOW(),
+                    checked_at TIMESTAMPTZ
+                )
+            ''')
+            # Tables created before checked_at existed: every row there was written by a lookup
+            cursor.execute('ALTER TABLE leaderboard_snapshot ALTER COLUMN updated_at DROP NOT NULL')
+            cursor.execute('ALTER TABLE leaderboard_snapshot ADD COLUMN IF NOT EXISTS checked_at TIMESTAMPTZ')
+            cursor.execute('UPDATE leaderboard_snapshot SET checked_at = updated_at WHERE checked_at IS NULL')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS leaderboard_snapshot_rank_idx
+                ON leaderboard_snapshot (rank_value DESC) WHERE tier IS NOT NULL
+            ''')
+            conn.commit()
+            self.tables_ready = True
+        except Exception as e:
+            conn.rollback()
+            print(f"Error creating leaderboard tables: {e}")
+        finally:
+            cursor.close()
+
+    async def fetch_player_data(self, settings, discord_id, name, tag, region, puuid, sub_region):
+        """Fetch rank and tactics.tools stats for one registered player.
+
+        Returns None when the player has no ranked entries and FETCH_FAILED when
+        Riot or tactics.tools could not be reached, so a transient error does not
+        wipe their snapshot row.
+        """
+        try:
+            print(f"\nProcessing player: {name}#{tag} ({region})")
+
+            # Get PUUID and the player's sub-region for TFT (stored at registration, resolved only when missing),
+            # then rank data using the correct sub-region
+            puuid, sub_region, league_data = await settings.with_riot_ids(
+                discord_id, name, tag, region, puuid, sub_region, self.riot.get_league_entries)
+            if not league_data or not league_data[0]:  # Check for empty list or missing data
+                print(f"No ranked data found for {name}")
+                return None
+            
+            rank_data = league_data[0]
+
+            # Get tactics.tools data
+            tactics_url = f"{self.tt_url}/{sub_region}/{name}/{tag}/{self.set_number}0/0"
+            tactics_data = await self.riot.get_json(tactics_url, "tactics.tools data")
+
+            overview = tactics_data["queueSeasonStats"]["1100"]
+            plays = overview["games"]
+            wins = overview["win"]
+            tops = overview["top4"]
+            win_percentage = (wins / plays) * 100
+            top4_percentage = (tops / plays) * 100
+
+            return {
+                'discord_id': str(discord_id),
+                'name': name,
+                'tier': rank_data['tier'],
+                'rank': rank_data.get('rank', 'I'),  # Default to I for Master+
+                'lp': rank_data['leaguePoints'],
+                'games': plays,
+                'win_rate': win_percentage,
+                'top4_rate': top4_percentage
+            }
+        except RiotAPIError as e:
+            print(f"No data for {name}: {str(e)}")
+            return FETCH_FAILED
+        except Exception as e:
+            print(f"Error fetching data for {name}: {str(e)}")
+            return FETCH_FAILED
+
+    def get_stale_players(self, conn, limit):
+        """Get the registered players who were looked up longest ago (never looked up first)"""
+        cursor = conn.cursor()
+        try:
+            # A NULL limit means every registered player
+            cursor.execute('''
+                SELECT CAST(s.discord_id AS TEXT), s.tft_name, s.tft_tag, s.region, s.puuid, s.platform
+                FROM tft_settings s
+                LEFT JOIN leaderboard_snapshot l ON l.discord_id = s.discord_id
+                WHERE s.discord_id <> ALL(%s)
+                ORDER BY l.checked_at ASC NULLS FIRST
+                LIMIT %s
+            ''', (self.ignored_users, limit))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def save_player(self, conn, discord_id, name, data):
+        """Upsert a player's snapshot row; players without ranked data are stored with no tier.
+
+        A failed lookup keeps the existing rank data and only marks the player as
+        checked (creating an empty row if they have none yet), so the refresher
+        moves on to the next player without making old data look fresh.
+        """
+        cursor = conn.cursor()
+        try:
+            if data is FETCH_FAILED:
+                cursor.execute('''
+                    INSERT INTO leaderboard_snapshot (discord_id, name, updated_at, checked_at)
+                    VALUES (%s, %s, NULL, NOW())
+                    ON CONFLICT (discord_id) DO UPDATE SET checked_at = EXCLUDED.checked_at
+                ''', (int(discord_id), name))
+                conn.commit()
+                return
+            if data:
+                values = (int(discord_id), name, data['tier'], data['rank'], data['lp'], data['games'],
+                          data['win_rate'], data['top4_rate'],
+                          self.get_rank_value(data['tier'], data['rank'], data['lp']))
+            else:
+                values = (int(discord_id), name, None, None, None, None, None, None, None)
+            cursor.execute('''
+                INSERT INTO leaderboard_snapshot
+                    (discord_id, name, tier, rank, lp, games, win_rate, top4_rate, rank_value, updated_at, checked_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                ON CONFLICT (discord_id)
+                DO UPDATE SET
+                    name = EXCLUDED.name,
+                    tier = EXCLUDED.tier,
+                    rank = EXCLUDED.rank,
+                    lp = EXCLUDED.lp,
+                    games = EXCLUDED.games,
+                    win_rate = EXCLUDED.win_rate,
+                    top4_rate = EXCLUDED.top4_rate,
+                    rank_value = EXCLUDED.rank_value,
+                    updated_at = EXCLUDED.updated_at,
+                    checked_at = EXCLUDED.checked_at
+            ''', values)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Error saving leaderboard snapshot for {name}: {e}")
+        finally:
+            cursor.close()
+
+    def get_top_players(self, conn, limit=10):
+        """Read the top of the materialized ranking along with the age of its oldest row.
+
+        Returns no players until every registered player has been looked up at
+        least once, since a ranking of only some of them would be misleading.
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT EXISTS (
+                    SELECT 1 FROM tft_settings s
+                    LEFT JOIN leaderboard_snapshot l ON l.discord_id = s.discord_id
+                    WHERE l.checked_at IS NULL AND s.discord_id <> ALL(%s)
+                )
+            ''', (self.ignored_users,))
+            if cursor.fetchone()[0]:
+                return [], None
+            cursor.execute('''
+                SELECT CAST(l.discord_id AS TEXT), l.name, l.tier, l.rank, l.lp, l.games, l.win_rate, l.top4_rate,
+                       MIN(l.updated_at) OVER () AS as_of
+                FROM leaderboard_snapshot l
+                JOIN tft_settings s ON s.discord_id = l.discord_id
+                WHERE l.tier IS NOT NULL AND l.discord_id <> ALL(%s)
+                ORDER BY l.rank_value DESC
+                LIMIT %s
+            ''', (self.ignored_users, limit))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        if not rows:
+            return [], None
+        keys = ('discord_id', 'name', 'tier', 'rank', 'lp', 'games', 'win_rate', 'top4_rate')
+        return [dict(zip(keys, row[:8])) for row in rows], rows[0][8]
+
+    def load_stale_players(self, limit):
+        with self.db.connection() as conn:
+            if not self.tables_ready:
+                self.create_tables(conn)
+            return self.get_stale_players(conn, limit)
+
+    def store_player(self, discord_id, name, data):
+        with self.db.connection() as conn:
+            self.save_player(conn, discord_id, name, data)
+
+    def load_top_players(self, limit=10):
+        with self.db.connection() as conn:
+            if not self.tables_ready:
+                self.create_tables(conn)
+            return self.get_top_players(conn, limit)
+
+    def create_embed(self, ctx, players, footer=None, timestamp=None):
+        """Build the leaderboard embed for players already sorted best first"""
+        embed = discord.Embed(
+            title="Comp TFT Leaderboard",
+            color=discord.Color.blue(),
+            timestamp=timestamp
+        )
+
+        # Add top 10 players to embed
+        for i, player in enumerate(players, 1):
+            rank_str = self.format_rank(player['tier'], player['rank'], player['lp'])
+
+            # Get member name if possible, otherwise use TFT name
+            member = ctx.guild.get_member(int(player['discord_id']))
+            display_name = member.display_name if member else player['name']
+
+            embed.add_field(
+                name=f"#{i} {display_name}",
+                value=f"{rank_str}\nWin: {player['win_rate']:.1f}%\nTop 4: {player['top4_rate']:.1f}%\nGames: {player['games']}",
+                inline=False
+            )
+
+        if footer:
+            embed.set_footer(text=footer)
+        return embed
+
+    async def build_leaderboard(self, ctx):
+        """Fetch every registered player, streaming the current top 10 into a status message as results arrive"""
+        settings = self.bot.get_cog('UserSettings')
+        # Connections are borrowed per query so the pool is not tied up while Riot is being called
+        players = await self.db.run(self.load_stale_players, None)
+        if not players:
+            await ctx.send("No players have registered their TFT accounts yet!")
+            return
+
+        total = len(players)
+        status_message = await ctx.send(f"Fetching leaderboard data for {total} players...")
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_players)
+
+        async def fetch(player):
+            async with semaphore:
+                return player, await self.fetch_player_data(settings, *player)
+
+        # Min-heap of (rank_value, arrival, data) holding the best 10 players seen so far
+        top = []
+        processed = 0
+        last_edit = 0
+        for next_result in asyncio.as_completed([fetch(player) for player in players]):
+            player, data = await next_result
+            processed += 1
+            await self.db.run(self.store_player, player[0], player[1], data)
+
+            if data and data is not FETCH_FAILED:
+                entry = (self.get_rank_value(data['tier'], data['rank'], data['lp']), processed, data)
+                if len(top) < 10:
+                    heapq.heappush(top, entry)
+                else:
+                    heapq.heappushpop(top, entry)
+
+            now = time.monotonic()
+            if top and processed < total and now - last_edit >= self.progress_seconds:
+                last_edit = now
+                ranked = [data for _, _, data in sorted(top, reverse=True)]
+                await status_message.edit(content=None, embed=self.create_embed(
+                    ctx, ranked, footer=f"Processed {processed}/{total} players..."))
+
+        if not top:
+            await status_message.edit(content="No ranked players found!", embed=None)
+            return
+
+        ranked = [data for _, _, data in sorted(top, reverse=True)]
+        await status_message.edit(content=None, embed=self.create_embed(
+            ctx, ranked, footer=f"Processed {total} players"))
+        print(f"Built leaderboard for {total} players")
+
+    @tasks.loop(seconds=60)
+    async def refresh_snapshot(self):
+        """Refresh the least recently updated players, a few at a time"""
+        settings = self.bot.get_cog('UserSettings')
+        if settings is None:
+            return
+
+        try:
+            players = await self.db.run(self.load_stale_players, self.players_per_refresh)
+            if not players:
+                return
+
+            semaphore = asyncio.Semaphore(self.max_concurrent_players)
+
+            async def refresh_player(player):
+                async with semaphore:
+                    data = await self.fetch_player_data(settings, *player)
+                await self.db.run(self.store_player, player[0], player[1], data)
+
+            await asyncio.gather(*[refresh_player(p) for p in players])
+            print(f"Refreshed leaderboard snapshot for {len(players)} players")
+        except Exception as e:
+            print(f"Error refreshing leaderboard snapshot: {e}")
+
+    @refresh_snapshot.before_loop
+    async def before_refresh_snapshot(self):
+        await self.bot.wait_until_ready()
+
     @commands.command(name='leaderboard', aliases=['lb'])
-    async def leaderboard(self, ctx):
-        """Show top 10 ranked players"""
+    async def leaderboard(self, ctx, option: str = None):
+        """Show top 10 ranked players. Use `.lb refresh` to rebuild it from scratch."""
         # Check if command is used in the correct channel
         if ctx.channel.id not in [1285382023887978526, 1308312472419307602, 1307388628275822714]:
             await ctx.send(f"This command can only be used in <#1285382023887978526>", delete_after=5)
@@ -59,159 +386,23 @@ class Leaderboard(commands.Cog):
             return
 
         try:
-            # Get all registered players from database
-            conn = self.bot.get_cog('UserSettings').get_db_connection()
-            cursor = conn.cursor()
-            
-            try:
-                cursor.execute('SELECT CAST(discord_id AS TEXT) AS discord_id, tft_name, tft_tag, region FROM tft_settings')
-                players = cursor.fetchall()
-                print("Filtering players...")
-                print(f"Ignored users: {self.ignored_users}")
-                for p in players:
-                    print(f"Checking player discord_id: {str(p[0])} (original value as string)")
-                # Filter out ignored users before processing - convert both to strings to avoid integer overflow
-                players = [p for p in players if str(p[0]) not in [str(uid) for uid in self.ignored_users]]
-                print(f"Found {len(players)} eligible players after filtering")
-                if not players:
-                    await ctx.send("No eligible players found.")
-                    return
-            finally:
-                cursor.close()
-                conn.close()
-
-            # Add loading message
-            message = await ctx.send("Fetching leaderboard data...")
-
-            async def make_request(session, url, name, operation):
-                for attempt in range(3):  # Try up to 3 times
-                    try:
-                        async with session.get(url, timeout=10) as response:  # 10 second timeout
-                            if response.status == 429:  # Rate limit hit
-                                retry_after = int(response.headers.get('Retry-After', 1))
-                                print(f"Rate limit hit for {name}, waiting {retry_after}s")
-                                await asyncio.sleep(retry_after)
-                                continue
-                            elif response.status != 200:
-                                print(f"Failed {operation} for {name}: {response.status}")
-                                return None
-                            return await response.json()
-                    except asyncio.TimeoutError:
-                        print(f"Timeout for {operation} {name}, attempt {attempt + 1}")
-                        await asyncio.sleep(1)
-                    except Exception as e:
-                        print(f"Error in {operation} for {name}: {str(e)}")
-                        return None
-                return None
+            if option is None:
+                # Read the ranking maintained by the background refresher
+                top_players, as_of = await self.db.run(self.load_top_players)
 
-            async def fetch_player_data(session, discord_id, name, tag, region):
-                try:
-                    print(f"\nProcessing player: {name}#{tag} ({region})")
-                    account_region = 'asia' if region.lower() == 'sea' else region
-                    
-                    # Get PUUID
-                    api_url = f"https://{account_region}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{urllib.parse.quote(name)}/{tag}?api_key={self.apikey}"
-                    player_data = await make_request(session, api_url, name, "PUUID lookup")
-                    if not player_data:
-                        return None
-                    puuid = player_data['puuid']
-
-                    await asyncio.sleep(0.5)  # Increased delay between requests
-
-                    # Get player's sub-region for TFT
-                    region_url = f"https://{account_region}.api.riotgames.com/riot/account/v1/region/by-game/tft/by-puuid/{puuid}?api_key={self.apikey}"
-                    region_data = await make_request(session, region_url, name, "region lookup")
-                    if not region_data:
-                        return None
-                    sub_region = region_data['region'].lower()
-
-                    await asyncio.sleep(0.5)  # Increased delay between requests
-
-                    # Get rank data using the correct sub-region
-                    league_url = f"https://{sub_region}.api.riotgames.com/tft/league/v1/by-puuid/{puuid}?api_key={self.apikey}"
-                    league_data = await make_request(session, league_url, name, "league data")
-                    if not league_data or not league_data[0]:  # Check for empty list or missing data
-                        print(f"No ranked data found for {name}")
-                        return None
-                    
-                    rank_data = league_data[0]
-
-                    # Get tactics.tools data
-                    tactics_url = f"{self.tt_url}/{sub_region}/{name}/{tag}/{self.set_number}0/0"
-                    tactics_data = await make_request(session, tactics_url, name, "tactics.tools data")
-                    if not tactics_data:
-                        print(f"No tactics.tools data found for {name}")
-                        return None
-
-                    overview = tactics_data["queueSeasonStats"]["1100"]
-                    plays = overview["games"]
-                    wins = overview["win"]
-                    tops = overview["top4"]
-                    win_percentage = (wins / plays) * 100
-                    top4_percentage = (tops / plays) * 100
-
-                    return {
-                        'discord_id': str(discord_id),
-                        'name': name,
-                        'tier': rank_data['tier'],
-                        'rank': rank_data.get('rank', 'I'),  # Default to I for Master+
-                        'lp': rank_data['leaguePoints'],
-                        'games': plays,
-                        'win_rate': win_percentage,
-                        'top4_rate': top4_percentage
-                    }
-                except Exception as e:
-                    print(f"Error fetching data for {name}: {str(e)}")
-                    return None
-
-            # Process players in chunks to avoid rate limits
-            timeout = aiohttp.ClientTimeout(total=120)  # Increased timeout for slower processing
-            chunk_size = 10  # Process 5 players at a time
-            player_ranks = []
-
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                for i in range(0, len(players), chunk_size):
-                    chunk = players[i:i + chunk_size]
-                    tasks = [fetch_player_data(session, p[0], p[1], p[2], p[3]) for p in chunk]
-                    chunk_results = [p for p in await asyncio.gather(*tasks) if p is not None]
-                    player_ranks.extend(chunk_results)
-                    
-                    if i + chunk_size < len(players):  # If there are more chunks to process
-                        print(f"Processed {i + chunk_size}/{len(players)} players, waiting before next chunk...")
-                        await asyncio.sleep(2)  # Wait 2 seconds between chunks
-
-            if not player_ranks:
-                await ctx.send("No ranked data found for any players.")
+                if top_players:
+                    await ctx.send(embed=self.create_embed(ctx, top_players, footer="Data as of", timestamp=as_of))
+                    return
+            elif option.lower() != 'refresh':
+                await ctx.send("Usage: `.lb` or `.lb refresh`")
                 return
 
-            # Sort players by rank
-            player_ranks.sort(
-                key=lambda x: self.get_rank_value(x['tier'], x['rank'], x['lp']),
-                reverse=True
-            )
-
-            # Create embed
-            embed = discord.Embed(
-                title="Comp TFT Leaderboard",
-                color=discord.Color.blue()
-            )
-
-            # Add top 10 players to embed
-            for i, player in enumerate(player_ranks[:10], 1):
-                rank_str = self.format_rank(player['tier'], player['rank'], player['lp'])
-                
-                # Get member name if possible, otherwise use TFT name
-                member = ctx.guild.get_member(int(player['discord_id']))
-                display_name = member.display_name if member else player['name']
-                
-                embed.add_field(
-                    name=f"#{i} {display_name}",
-                    value=f"{rank_str}\nWin: {player['win_rate']:.1f}%\nTop 4: {player['top4_rate']:.1f}%\nGames: {player['games']}",
-                    inline=False
-                )
-
-            await message.delete()
-            await ctx.send(embed=embed)
+            # Snapshot not complete yet, or a refresh was requested: build the whole thing now
+            if self.build_lock.locked():
+                await ctx.send("The leaderboard is already being built. Please try again shortly.")
+                return
+            async with self.build_lock:
+                await self.build_leaderboard(ctx)
 
         except Exception as e:
             import traceback
@@ -221,5 +412,5 @@ class Leaderboard(commands.Cog):
             traceback.print_exc()
             await ctx.send("An error occurred while fetching the leaderboard.")
 
-async def setup(bot, apikey, set_number):
-    await bot.add_cog(Leaderboard(bot, apikey, set_number))
+async def setup(bot, riot, database, set_number, leaderboard_config=None):
+    await bot.add_cog(Leaderboard(bot, riot, database, set_number, leaderboard_config))
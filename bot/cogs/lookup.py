@@ -6,8 +6,9 @@ import os
 
 class Lookup(commands.Cog):
 
-    def __init__(self, bot, set_number):
+    def __init__(self, bot, set_number, http):
         self.bot = bot
+        self.http = http
         self.set_number = set_number
         self.session = None
         self.unit_special_cases = {}
@@ -38,13 +39,10 @@ class Lookup(commands.Cog):
             print(f"Error loading config files: {e}")
 
     async def cog_load(self):
-        self.session = aiohttp.ClientSession()
+        # Borrow the bot-wide pooled session; it is shared with the other cogs so it is not closed here
+        self.session = self.http.session
         self.patch_number = await self.get_latest_patch()
 
-    async def cog_unload(self):
-        if self.session:
-            await self.session.close()
-
     @commands.command(name='lookup')
     async def lookup_item(self, ctx, *args):
         """Look up item stats. Examples: 
@@ -389,5 +387,5 @@ class Lookup(commands.Cog):
         except aiohttp.ClientError as e:
             await ctx.send(f"Error occurred: {str(e)}")
 
-async def setup(bot, set_number):
-    await bot.add_cog(Lookup(bot, set_number))
+async def setup(bot, set_number, http):
+    await bot.add_cog(Lookup(bot, set_number, http))
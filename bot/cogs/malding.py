@@ -1,39 +1,25 @@
 import discord
 from discord.ext import commands
 import psycopg2
-import os
 import random
 
 class MaldingCommand(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, database):
         self.bot = bot
-        self.conn = self.connect_to_db()
-
-    def connect_to_db(self):
-        DATABASE_URL = os.environ.get('DATABASE_URL')
-        try:
-            return psycopg2.connect(DATABASE_URL, sslmode='require')
-        except psycopg2.Error as e:
-            print(f"Error connecting to the database: {e}")
-            return None
+        self.db = database
 
     def get_random_malding_message(self):
-        if self.conn is None:
-            print("No database connection.")
-            return None
-
         try:
-            cursor = self.conn.cursor()
-            query = """
-                SELECT content 
-                FROM malding_messages 
-                WHERE author_id != 1285268322551726140 
-                ORDER BY RANDOM() 
-                LIMIT 1
-            """
-            cursor.execute(query)
-            result = cursor.fetchone()
-            cursor.close()
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                query = """
+                    SELECT content 
+                    FROM malding_messages 
+                    WHERE author_id != 1285268322551726140 
+                    ORDER BY RANDOM() 
+                    LIMIT 1
+                """
+                cursor.execute(query)
+                result = cursor.fetchone()
             return result[0] if result else None
         except psycopg2.Error as e:
             print(f"Error fetching random message: {e}")
@@ -47,11 +33,11 @@ class MaldingCommand(commands.Cog):
 
         for _ in range(num_messages):
             # Get a random message from the database
-            random_message = self.get_random_malding_message()
+            random_message = await self.db.run(self.get_random_malding_message)
             if random_message:
                 await ctx.send(random_message)
             else:
                 print("No malding messages found in the database.")
 
-async def setup(bot):
-    await bot.add_cog(MaldingCommand(bot))
\ No newline at end of file
+async def setup(bot, database):
+    await bot.add_cog(MaldingCommand(bot, database))
\ No newline at end of file
@@ -8,17 +8,14 @@ import os
 
 
 class MiscCommands(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, database):
         self.bot = bot
-        self.database_url = os.environ.get('DATABASE_URL')  # Get the database URL from environment variables
+        self.db = database
 
-    # Function to connect to the database and fetch the image
+    # Function to borrow a pooled connection and fetch the image
     def fetch_image_from_db(self, image_name):
         try:
-            # Establish connection to PostgreSQL
-            conn = psycopg2.connect(self.database_url, sslmode='require')
-
-            with conn.cursor() as cursor:
+            with self.db.connection() as conn, conn.cursor() as cursor:
                 # Fetch the image data from the database
                 cursor.execute("SELECT image_data FROM images WHERE image_name = %s", (image_name,))
                 result = cursor.fetchone()
@@ -34,15 +31,11 @@ class MiscCommands(commands.Cog):
             print(f"Error fetching image from the database: {e}")
             return None
 
-        finally:
-            if conn:
-                conn.close()
-
     # Command to post an image from the database
     @commands.command()
     async def vuhra(self, ctx):
         image_name = 'vuhra'  # The name of the image to fetch from the database
-        image_data = self.fetch_image_from_db(image_name)
+        image_data = await self.db.run(self.fetch_image_from_db, image_name)
 
         if image_data is not None:
             # Save the image data to a temporary file
@@ -62,7 +55,7 @@ class MiscCommands(commands.Cog):
     @commands.command()
     async def fam(self, ctx):
         image_name = 'family'  # The name of the image to fetch from the database
-        image_data = self.fetch_image_from_db(image_name)
+        image_data = await self.db.run(self.fetch_image_from_db, image_name)
 
         if image_data is not None:
             # Save the image data to a temporary file
@@ -82,7 +75,7 @@ class MiscCommands(commands.Cog):
     @commands.command()
     async def lowroll(self, ctx):
         image_name = 'lowroll'  # The name of the image to fetch from the database
-        image_data = self.fetch_image_from_db(image_name)
+        image_data = await self.db.run(self.fetch_image_from_db, image_name)
 
         if image_data is not None:
             # Save the image data to a temporary file
@@ -302,5 +295,5 @@ class MiscCommands(commands.Cog):
         except Exception as e:
             print(f"Coinflip error: {str(e)}")
 
-async def setup(bot):
-    await bot.add_cog(MiscCommands(bot))
+async def setup(bot, database):
+    await bot.add_cog(MiscCommands(bot, database))
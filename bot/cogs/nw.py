@@ -1,56 +1,40 @@
 import discord
 from discord.ext import commands
 import psycopg2
-import os
 
 class NoobWatchCommand(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, database):
         self.bot = bot
-        self.conn = self.connect_to_db()
+        self.db = database
 
-    def connect_to_db(self):
-        DATABASE_URL = os.environ.get('DATABASE_URL')
-        try:
-            conn = psycopg2.connect(DATABASE_URL, sslmode='require')
-            self.create_table_if_not_exists(conn)  # Ensure the table exists
-            return conn
-        except psycopg2.Error as e:
-            print(f"Error connecting to the database: {e}")
-            return None
+    async def cog_load(self):
+        await self.db.run(self.create_table_if_not_exists)
 
-    def create_table_if_not_exists(self, conn):
+    def create_table_if_not_exists(self):
         # Create table if it doesn't exist
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS noobwatch (
-                    user_id BIGINT PRIMARY KEY,
-                    count INTEGER DEFAULT 1
-                )
-            """)
-            conn.commit()
-            cursor.close()
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS noobwatch (
+                        user_id BIGINT PRIMARY KEY,
+                        count INTEGER DEFAULT 1
+                    )
+                """)
         except psycopg2.Error as e:
             print(f"Error creating table: {e}")
 
     def update_noobwatch_count(self, user_id):
-        if self.conn is None:
-            print("No database connection.")
-            return None
-
         try:
-            cursor = self.conn.cursor()
-            query = """
-                INSERT INTO noobwatch (user_id, count) 
-                VALUES (%s, 1) 
-                ON CONFLICT (user_id) 
-                DO UPDATE SET count = noobwatch.count + 1 
-                RETURNING count
-            """
-            cursor.execute(query, (user_id,))
-            result = cursor.fetchone()
-            self.conn.commit()
-            cursor.close()
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                query = """
+                    INSERT INTO noobwatch (user_id, count) 
+                    VALUES (%s, 1) 
+                    ON CONFLICT (user_id) 
+                    DO UPDATE SET count = noobwatch.count + 1 
+                    RETURNING count
+                """
+                cursor.execute(query, (user_id,))
+                result = cursor.fetchone()
             return result[0] if result else None
         except psycopg2.Error as e:
             print(f"Error updating noobwatch count: {e}")
@@ -58,21 +42,16 @@ class NoobWatchCommand(commands.Cog):
 
     def get_leaderboard(self):
         """Fetch the top 10 users with the highest noobwatch count."""
-        if self.conn is None:
-            print("No database connection.")
-            return None
-
         try:
-            cursor = self.conn.cursor()
-            query = """
-                SELECT user_id, count 
-                FROM noobwatch 
-                ORDER BY count DESC 
-                LIMIT 10
-            """
-            cursor.execute(query)
-            leaderboard = cursor.fetchall()
-            cursor.close()
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                query = """
+                    SELECT user_id, count 
+                    FROM noobwatch 
+                    ORDER BY count DESC 
+                    LIMIT 10
+                """
+                cursor.execute(query)
+                leaderboard = cursor.fetchall()
             return leaderboard
         except psycopg2.Error as e:
             print(f"Error fetching leaderboard: {e}")
@@ -89,7 +68,7 @@ class NoobWatchCommand(commands.Cog):
         if ctx.message.reference:  # Check if the message is a reply
             replied_to_message = await ctx.channel.fetch_message(ctx.message.reference.message_id)
             user = replied_to_message.author  # Get the user the command issuer replied to
-            count = self.update_noobwatch_count(user.id)
+            count = await self.db.run(self.update_noobwatch_count, user.id)
             if count is not None:
                 await ctx.send(f"{user.display_name}'s NoobWatch count is now {count}.")
             else:
@@ -100,7 +79,7 @@ class NoobWatchCommand(commands.Cog):
     @commands.command()
     async def topnoobs(self, ctx):
         """Display the top 10 users in the NoobWatch leaderboard as an embed."""
-        leaderboard = self.get_leaderboard()
+        leaderboard = await self.db.run(self.get_leaderboard)
         if leaderboard:
             # Create the embed
             embed = discord.Embed(
@@ -122,5 +101,5 @@ class NoobWatchCommand(commands.Cog):
         else:
             print("No leaderboard data available.")
 
-async def setup(bot):
-    await bot.add_cog(NoobWatchCommand(bot))
+async def setup(bot, database):
+    await bot.add_cog(NoobWatchCommand(bot, database))
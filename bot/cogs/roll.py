@@ -1,71 +1,103 @@
 import discord
 from discord.ext import commands
-import random
-import aiohttp
+import asyncio
+import re
 from PIL import Image
 from io import BytesIO
+from utils.image_output import describe, encode_image, file_name
+from utils.shop import ShopSimulator
 
 class RollCommands(commands.Cog):
-    def __init__(self, bot, champions_data, latest_version, shop_odds, set_number):
+    def __init__(self, bot, static_data, latest_version, shop_odds, set_number, asset_cache, output=None, shop_config=None):
         self.bot = bot
-        self.champions_data = champions_data
+        self.output = output
+        self.assets = asset_cache
+        self.static_data = static_data
         self.latest_version = latest_version
         self.shop_odds = shop_odds
         self.set_number = set_number
 
+        # Copies of each champion per tier and how much work .odds may do
+        shop_config = shop_config or {}
+        self.pool_sizes = shop_config.get('pool_sizes', {"1": 30, "2": 25, "3": 18, "4": 10, "5": 9})
+        self.odds_trials = shop_config.get('odds_trials', 20000)
+        self.max_rolls = shop_config.get('max_rolls', 200)
+
+        # Champion keys per set and tier, rebuilt whenever the registry swaps in new champion data
+        self.indexed_champions = None
+        self.pools = {}
+        self.champion_names = {}
+        self.simulator = None
+        self.index_champions()
+
+    def index_champions(self):
+        """Index the champion data into per-set, per-tier tuples"""
+        champions = self.static_data.champions
+        pools = {}
+        for name, details in champions.items():
+            # Set champions have ids like TFT16_Ahri, tutorial and other units don't
+            prefix = details['id'].split('_', 1)[0]
+            if not prefix.startswith('TFT') or not prefix[3:].isdigit():
+                continue
+            pools.setdefault(prefix[3:], {}).setdefault(details['tier'], []).append(name)
+
+        self.pools = {set_number: {tier: tuple(names) for tier, names in tiers.items()}
+                      for set_number, tiers in pools.items()}
+        self.indexed_champions = champions
+        print(f"Indexed roll pools for {len(self.pools)} sets")
+
+        # The shop engine and name lookup only cover the current set
+        current = self.pools.get(str(self.set_number), {})
+        self.simulator = ShopSimulator(current, self.pool_sizes, self.shop_odds)
+        self.champion_names = {self.normalize_name(champions[name]['name']): name
+                               for names in current.values() for name in names}
+
+    @staticmethod
+    def normalize_name(name):
+        return re.sub(r'[^a-z0-9]', '', name.lower())
+
+    def get_simulator(self):
+        if self.static_data.champions is not self.indexed_champions:
+            self.index_champions()
+        return self.simulator
+
     @commands.command()
     async def roll(self, ctx, level: int = 5):
-        if not self.champions_data:
+        if not self.static_data.champions:
             print("Champions data is not available. Please wait while we update it.")
-            await self.fetch_champions_data()
-
-        # Convert level to string when accessing shop_odds
-        odds = self.shop_odds[str(level)]
-
-        tiers = [1, 2, 3, 4, 5]
-        results = []
+            await self.static_data.load(self.latest_version)
 
-        # Filter out champions with "Tutorial" in their name
-        valid_champions = {name: details for name, details in self.champions_data.items() if f"TFT{self.set_number}" in details['id']}
+        # Only levels with configured shop odds can be rolled
+        if str(level) not in self.shop_odds:
+            await ctx.send(f"Level must be between {min(map(int, self.shop_odds))} and {max(map(int, self.shop_odds))}.")
+            return
 
-        # Roll champions based on the odds
-        for tier in tiers:
-            count = odds[tier - 1]
-            if count > 0:
-                tier_champions = [name for name, details in valid_champions.items() if details['tier'] == tier]
-                if tier_champions:
-                    results.extend(random.choices(tier_champions, k=count))
+        # Roll one shop from a full bag
+        selected_champions = self.get_simulator().roll_fresh_shop(level)
 
         # If no champions were selected
-        if not results:
+        if not selected_champions:
             print("No champions rolled. Please try again.")
             return
 
-        # Ensure the number of units does not exceed available champions
-        num_units = min(len(results), 5)
-        selected_champions = random.sample(results, num_units)
-
         # Create a list to store the images
         images = []
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-            for champion_name in selected_champions:
-                champion = self.champions_data[champion_name]
-                name = champion['name'].replace("'", "")  # Remove single quotes
-                full_image_name = champion['image']['full']
-                image_url = f"https://ddragon.leagueoflegends.com/cdn/{self.latest_version}/img/tft-champion/{full_image_name}"
-
-                try:
-                    # Fetch the image
-                    async with session.get(image_url) as response:
-                        if response.status == 200:
-                            img_data = await response.read()
-                            img = Image.open(BytesIO(img_data))
-                            images.append(img)
-                        else:
-                            await ctx.send(f"Failed to fetch image for {name}. Status code: {response.status}")
-                except Exception as e:
-                    await ctx.send(f"Error fetching image for {name}: {e}")
+        for champion_name in selected_champions:
+            champion = self.static_data.champions[champion_name]
+            name = champion['name'].replace("'", "")  # Remove single quotes
+            full_image_name = champion['image']['full']
+            image_url = f"https://ddragon.leagueoflegends.com/cdn/{self.latest_version}/img/tft-champion/{full_image_name}"
+
+            try:
+                # Fetch the image (served from the asset cache after the first roll)
+                img = await self.assets.fetch_image(image_url)
+                if img:
+                    images.append(img)
+                else:
+                    await ctx.send(f"Failed to fetch image for {name}.")
+            except Exception as e:
+                await ctx.send(f"Error fetching image for {name}: {e}")
 
         # Combine the images into a single image
         if images:
@@ -78,14 +110,58 @@ class RollCommands(commands.Cog):
                 combined_image.paste(img, (x_offset, 0))
                 x_offset += img.width
 
-            # Save the combined image to a BytesIO object
-            with BytesIO() as output:
-                combined_image.save(output, format='PNG')
-                output.seek(0)
-                combined_image_file = discord.File(output, filename='combined_champions.png')
-                await ctx.send(file=combined_image_file)
+            # Encode the combined image with this command's output settings
+            data, info = encode_image(combined_image, self.output)
+            print(describe("combined champions", info))
+            combined_image_file = discord.File(BytesIO(data), filename=file_name('combined_champions', self.output))
+            await ctx.send(file=combined_image_file)
         else:
             await ctx.send("No images available to display.")
 
-async def setup(bot, champions_data, latest_version, shop_odds, set_number):
-    await bot.add_cog(RollCommands(bot, champions_data, latest_version, shop_odds, set_number))
+    @commands.command()
+    async def odds(self, ctx, *args):
+        """Chance to 3-star a champion: .odds <champion> <level> [copies out] [copies owned] [rolls]"""
+        usage = "Usage: `.odds <champion> <level> [copies out] [copies owned] [rolls]` e.g. `.odds Ahri 7 3 0 40`"
+
+        # Trailing numbers are the options, everything before them is the champion name
+        numbers = []
+        words = list(args)
+        while words and words[-1].isdigit() and len(numbers) < 4:
+            numbers.insert(0, int(words.pop()))
+        if not words or not numbers:
+            await ctx.send(usage)
+            return
+        level, copies_out, owned, rolls = numbers + [None, 0, 0, 30][len(numbers):]
+
+        if str(level) not in self.shop_odds:
+            await ctx.send(f"Level must be between {min(map(int, self.shop_odds))} and {max(map(int, self.shop_odds))}.")
+            return
+        if not 1 <= rolls <= self.max_rolls:
+            await ctx.send(f"Rolls must be between 1 and {self.max_rolls}.")
+            return
+
+        simulator = self.get_simulator()
+        champion = self.champion_names.get(self.normalize_name(' '.join(words)))
+        if not champion:
+            await ctx.send(f"Could not find a set {self.set_number} champion named {' '.join(words)}.")
+            return
+
+        try:
+            # Tens of thousands of simulated games, kept off the event loop
+            result = await asyncio.to_thread(
+                simulator.hit_odds, champion, level, copies_out, owned, rolls, 9, self.odds_trials
+            )
+        except ValueError as e:
+            await ctx.send(str(e))
+            return
+
+        name = self.static_data.champions[champion]['name']
+        message = (f"**{name}** at level {level} with {copies_out} out and {owned} owned, {rolls} rolls: "
+                   f"**{result['probability'] * 100:.1f}%** to 3-star")
+        if result['average_rolls'] is not None:
+            message += f" (hits after {result['average_rolls']:.0f} rolls on average)"
+        message += f"\nAverage copies owned after rolling: {result['expected_copies']:.1f} ({self.odds_trials:,} simulated games)"
+        await ctx.send(message)
+
+async def setup(bot, static_data, latest_version, shop_odds, set_number, asset_cache, output=None, shop_config=None):
+    await bot.add_cog(RollCommands(bot, static_data, latest_version, shop_odds, set_number, asset_cache, output, shop_config))
@@ -1,15 +1,15 @@
 import discord
 from discord.ext import commands
-import requests
-import urllib.parse
 import os
 import re
 import psycopg2
+from utils.riot import RiotAPIError
 
 class StatCommands(commands.Cog):
-    def __init__(self, bot, apikey, latest_version, set_number):
+    def __init__(self, bot, riot, latest_version, set_number, static_data):
         self.bot = bot
-        self.apikey = apikey  # Assigning API key correctly
+        self.riot = riot
+        self.static_data = static_data
         self.latest_version = latest_version
         self.set_number= set_number
         self.tt_url = os.getenv('tt_url')
@@ -43,8 +43,7 @@ class StatCommands(commands.Cog):
                 return
 
             # Get user settings from database
-            conn = self.bot.get_cog('UserSettings').get_db_connection()
-            cursor = conn.cursor()
+            settings = self.bot.get_cog('UserSettings')
             
             # Use mentioned member's ID if provided, otherwise use author's ID
             discord_id = member.id if member else ctx.author.id
@@ -54,68 +53,34 @@ class StatCommands(commands.Cog):
                 discord_id_str = str(discord_id)
                 print(f"Looking up settings for discord_id: {discord_id_str}")
                 
-                cursor.execute('SELECT tft_name, tft_tag, region FROM tft_settings WHERE discord_id = %s', (discord_id_str,))
-                result = cursor.fetchone()
+                result = await settings.db.run(settings.get_registration, discord_id_str)
                 if not result:
                     user_reference = "their" if member else "your"
                     await ctx.send(f"This user has not registered their name and tag yet. [.set ZTK#TFT americas or .setname ZTK#TFT americas] (americas, europe, asia, sea)")
                     return
                 
-                gameName, tagLine, stored_region = result
+                gameName, tagLine, stored_region, puuid, current_region = result
                 print(f"Found settings: name={gameName}, tag={tagLine}, region={stored_region}")
             except psycopg2.Error as db_error:
                 print(f"Database error in stats command: {str(db_error)}")
                 await ctx.send("Error accessing user settings. Please try again later.")
                 return
-            finally:
-                cursor.close()
-                conn.close()
 
-            shortened_gameName = gameName.strip()
-            # Encode the gameName to handle spaces and special characters
-            encoded_gameName = urllib.parse.quote(gameName)
-
-            # For SEA region, we need to use asia region for account lookup
-            account_region = 'asia' if stored_region.lower() == 'sea' else stored_region
-            
-            # Get player region and puuid
-            api_url = f"https://{account_region}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{encoded_gameName}/{tagLine}?api_key={self.apikey}"
-            response = requests.get(api_url)
-            if response.status_code == 200:
-                player_data = response.json()
-                puuid = player_data['puuid']
-                # Get player's region (use account_region for this lookup as well)
-                region_url = f"https://{account_region}.api.riotgames.com/riot/account/v1/region/by-game/tft/by-puuid/{puuid}?api_key={self.apikey}"
-                region_response = requests.get(region_url)
-                if region_response.status_code == 200:
-                    region_data = region_response.json()
-                    current_region = region_data['region'].lower()
+            # Get player puuid and region (stored with the registration, only resolved when missing), then league data
+            try:
+                puuid, current_region, league_data = await settings.with_riot_ids(
+                    discord_id, gameName, tagLine, stored_region, puuid, current_region, self.riot.get_league_entries)
+            except RiotAPIError as e:
+                if e.operation == "league data":
+                    await ctx.send("Failed to get league data. Please check your name and region.")
                 else:
-                    print(f"Failed to get player region. Status code: {region_response.status_code}")
-                    print(f"Response: {region_response.text}")
-                    await ctx.send("Failed to get player region. Please check your name and region.")
-                    return
-            else:
-                print(f"Failed to get puuid. Status code: {response.status_code}")
-                print(f"Response: {response.text}")
-                await ctx.send("Failed to lookup player. Please check your name and region.")
+                    await ctx.send("Failed to lookup player. Please check your name and region.")
                 return
-
-            # Get league data using PUUID and region
-            league_url = f"https://{current_region}.api.riotgames.com/tft/league/v1/by-puuid/{puuid}?api_key={self.apikey}"
-            league_response = requests.get(league_url)
-            if league_response.status_code == 200:
-                league_data = league_response.json()
-                if not league_data:
-                    print("No league data found.")
-                    print(f"PUUID: {puuid}")
-                    print(f"Region: {current_region}")
-                    await ctx.send("No ranked data found for this player.")
-                    return
-            else:
-                print(f"Failed to get league data. Status code: {league_response.status_code}")
-                print(f"Response: {league_response.text}")
-                await ctx.send("Failed to get league data. Please check your name and region.")
+            if not league_data:
+                print("No league data found.")
+                print(f"PUUID: {puuid}")
+                print(f"Region: {current_region}")
+                await ctx.send("No ranked data found for this player.")
                 return
 
             # Extract the required data
@@ -129,13 +94,12 @@ class StatCommands(commands.Cog):
             # Fetch match stats for calculating Win %, Top 4 %, and Avg Placement
             tactics_url = f"{self.tt_url}/{current_region}/{gameName}/{tagLine}/{self.set_number}0/0"
             print(f"Tactics.tools URL: {tactics_url}")
-            tactics_response = requests.get(tactics_url)
-            if tactics_response.status_code != 200:
-                print(f"Failed to get tactics.tools data. Status code: {tactics_response.status_code}")
-                print(f"Response: {tactics_response.text}")
+            try:
+                data = await self.riot.get_json(tactics_url, "tactics.tools data")
+            except RiotAPIError:
+                data = None
 
-            if tactics_response.status_code == 200:
-                data = tactics_response.json()
+            if data:
                 overview = data["queueSeasonStats"]["1100"]
                 # icon_id = data["playerInfo"]["profileIconId"]
                 local_rank = data["playerInfo"]["localRank"]
@@ -174,13 +138,11 @@ class StatCommands(commands.Cog):
             tier_key = tier.capitalize()
 
             # Get the regalia image based on the player's rank
-            regalia_url = f"https://ddragon.leagueoflegends.com/cdn/{self.latest_version}/data/en_US/tft-regalia.json"
-            regalia_response = requests.get(regalia_url)
-            regalia_data = regalia_response.json()
+            ranked_regalia = self.static_data.regalia.get("RANKED_TFT", {})
 
             rank_image_url = None
-            if tier_key in regalia_data["data"]["RANKED_TFT"]:
-                rank_image = regalia_data["data"]["RANKED_TFT"][tier_key]["image"]["full"]
+            if tier_key in ranked_regalia:
+                rank_image = ranked_regalia[tier_key]["image"]["full"]
                 rank_image_url = f"https://ddragon.leagueoflegends.com/cdn/{self.latest_version}/img/tft-regalia/{rank_image}"
 
             embed_color = rank_colors.get(tier_key, discord.Color.default())
@@ -218,5 +180,5 @@ class StatCommands(commands.Cog):
             await ctx.send(f"An error occurred while looking up your stats. Please check your name and region.")
 
 
-async def setup(bot, apikey, latest_version, set_number):
-    await bot.add_cog(StatCommands(bot, apikey, latest_version, set_number))
+async def setup(bot, riot, latest_version, set_number, static_data):
+    await bot.add_cog(StatCommands(bot, riot, latest_version, set_number, static_data))
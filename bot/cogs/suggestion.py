@@ -1,25 +1,18 @@
 import discord
 from discord.ext import commands
 import psycopg2
-import os
 
 class SuggestionCog(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, database):
         self.bot = bot
-        self.conn = self.connect_to_db()
-        self.create_suggestions_table()
+        self.db = database
 
-    def connect_to_db(self):
-        DATABASE_URL = os.environ.get('DATABASE_URL')
-        try:
-            return psycopg2.connect(DATABASE_URL, sslmode='require')
-        except psycopg2.Error as e:
-            print(f"Error connecting to the database: {e}")
-            return None
+    async def cog_load(self):
+        await self.db.run(self.create_suggestions_table)
 
     def create_suggestions_table(self):
-        if self.conn:
-            with self.conn.cursor() as cur:
+        try:
+            with self.db.connection() as conn, conn.cursor() as cur:
                 cur.execute("""
                     CREATE TABLE IF NOT EXISTS suggestions (
                         id SERIAL PRIMARY KEY,
@@ -28,24 +21,30 @@ class SuggestionCog(commands.Cog):
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
-                self.conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error creating suggestions table: {e}")
 
-    @commands.command(name="suggest")
-    async def suggest(self, ctx, *, suggestion: str):
-        """Allows users to submit suggestions."""
-        user_id = ctx.author.id
-        if self.conn:
-            with self.conn.cursor() as cur:
+    def save_suggestion(self, user_id, suggestion):
+        try:
+            with self.db.connection() as conn, conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO suggestions (user_id, suggestion)
                     VALUES (%s, %s)
                 """, (user_id, suggestion))
-                self.conn.commit()
+            return True
+        except psycopg2.Error as e:
+            print(f"Sorry, there was an error saving your suggestion. Please try again later. ({e})")
+            return False
+
+    @commands.command(name="suggest")
+    async def suggest(self, ctx, *, suggestion: str):
+        """Allows users to submit suggestions."""
+        user_id = ctx.author.id
+        if not await self.db.run(self.save_suggestion, user_id, suggestion):
+            return
 
-            await ctx.send(f"Thank you for your suggestion, {ctx.author.display_name}!")
-        else:
-            print("Sorry, there was an error saving your suggestion. Please try again later.")
+        await ctx.send(f"Thank you for your suggestion, {ctx.author.display_name}!")
 
 
-async def setup(bot):
-    await bot.add_cog(SuggestionCog(bot))
\ No newline at end of file
+async def setup(bot, database):
+    await bot.add_cog(SuggestionCog(bot, database))
\ No newline at end of file
@@ -1,13 +1,13 @@
 import discord
 from discord.ext import commands
-import aiohttp
 import difflib
+from utils.riot import RiotAPIError
 
 
 class LeaderboardCommands(commands.Cog):
-    def __init__(self, bot, apikey):
+    def __init__(self, bot, riot):
         self.bot = bot
-        self.apikey = apikey
+        self.riot = riot
 
     # List of available summoner regions
     summoner_regions = ["na1", "eun1", "euw1", "br1", "jp1", "kr", "la1", "la2", "me1", "oc1", "ph2", "ru", "sg2",
@@ -27,43 +27,34 @@ class LeaderboardCommands(commands.Cog):
             return
 
         # Step 1: Fetch the list of users and their ranks (Top Challenger players)
-        url = f"https://{closest_region}.api.riotgames.com/tft/league/v1/challenger?queue=RANKED_TFT&api_key={self.apikey}"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    print(f"Failed to fetch Challenger data for {closest_region}.")
-                    return
+        try:
+            data = await self.riot.get_league(closest_region, 'challenger')
+        except RiotAPIError:
+            print(f"Failed to fetch Challenger data for {closest_region}.")
+            return
 
-                data = await response.json()
-                entries = data['entries']
-                sorted_entries = sorted(entries, key=lambda x: x['leaguePoints'], reverse=True)[:5]
-                summoner_ids = [entry['summonerId'] for entry in sorted_entries]
+        entries = data['entries']
+        sorted_entries = sorted(entries, key=lambda x: x['leaguePoints'], reverse=True)[:5]
+        summoner_ids = [entry['summonerId'] for entry in sorted_entries]
 
         # Step 2: Fetch summoner information (get `puuid`)
         summoner_to_puuid = {}
-        async with aiohttp.ClientSession() as session:
-            for summoner_id in summoner_ids:
-                summ_url = f"https://{closest_region}.api.riotgames.com/tft/summoner/v1/summoners/{summoner_id}?api_key={self.apikey}"
-                async with session.get(summ_url) as summ_response:
-                    if summ_response.status == 200:
-                        summ_data = await summ_response.json()
-                        if 'puuid' in summ_data:
-                            summoner_to_puuid[summoner_id] = summ_data['puuid']
-                    else:
-                        print(f"Failed to fetch summoner data for summonerId {summoner_id}.")
+        for summoner_id in summoner_ids:
+            try:
+                summ_data = await self.riot.get_summoner(closest_region, summoner_id)
+                if 'puuid' in summ_data:
+                    summoner_to_puuid[summoner_id] = summ_data['puuid']
+            except RiotAPIError:
+                print(f"Failed to fetch summoner data for summonerId {summoner_id}.")
 
         # Step 3: Fetch the actual summoner name using the `puuid`
         puuid_to_name = {}
-        async with aiohttp.ClientSession() as session:
-            for summoner_id, puuid in summoner_to_puuid.items():
-                puuid_url = f"https://americas.api.riotgames.com/riot/account/v1/accounts/by-puuid/{puuid}?api_key={self.apikey}"
-                async with session.get(puuid_url) as puuid_response:
-                    if puuid_response.status == 200:
-                        puuid_data = await puuid_response.json()
-                        puuid_to_name[puuid] = puuid_data['gameName']
-                    else:
-                        print(f"Failed to fetch account name for puuid {puuid}.")
+        for summoner_id, puuid in summoner_to_puuid.items():
+            try:
+                puuid_data = await self.riot.get_account_by_puuid(puuid, 'americas')
+                puuid_to_name[puuid] = puuid_data['gameName']
+            except RiotAPIError:
+                print(f"Failed to fetch account name for puuid {puuid}.")
 
         # Strip the number from the region (e.g., "na1" -> "na", "euw1" -> "euw")
         stripped_region = ''.join([char for char in closest_region if not char.isdigit()])
@@ -94,5 +85,5 @@ class LeaderboardCommands(commands.Cog):
 
 
 # Setup function for the cog
-async def setup(bot, apikey):
-    await bot.add_cog(LeaderboardCommands(bot, apikey))
+async def setup(bot, riot):
+    await bot.add_cog(LeaderboardCommands(bot, riot))
@@ -1,22 +1,23 @@
 import discord
 from discord.ext import commands
-import requests
 import random
 from io import BytesIO
+from utils.image_output import describe, encode_image, file_name
 from PIL import Image
 
 class TrainerCommands(commands.Cog):
-    def __init__(self, bot, apikey, latest_version):
+    def __init__(self, bot, apikey, latest_version, static_data, asset_cache, output=None):
         self.bot = bot
+        self.output = output
+        self.static_data = static_data
+        self.assets = asset_cache
         self.apikey = apikey
         self.latest_version = latest_version
 
     @commands.command()
     async def trainer(self, ctx):
         try:
-            url = f"https://ddragon.leagueoflegends.com/cdn/{self.latest_version}/data/en_US/tft-trait.json"
-            response = requests.get(url)
-            data = response.json()["data"]
+            data = self.static_data.traits
 
             # Define the ignore list and filter criteria
             ignore_list = {"TFT14_ViegoUniqueTrait", "TFT14_Overlord", "TFT14_Virus", "TFT14_BallisTek", "TFT14_Netgod"}
@@ -28,9 +29,9 @@ class TrainerCommands(commands.Cog):
             images = []
             for trait in selected_traits:
                 image_url = f"https://ddragon.leagueoflegends.com/cdn/{self.latest_version}/img/tft-trait/{trait['image']['full']}"
-                response = requests.get(image_url)
-                image = Image.open(BytesIO(response.content))
-                images.append(image)
+                image = await self.assets.fetch_image(image_url)
+                if image:
+                    images.append(image)
 
             # Combine the images horizontally
             if images:
@@ -43,17 +44,16 @@ class TrainerCommands(commands.Cog):
                     combined_image.paste(img, (x_offset, 0))
                     x_offset += img.width
 
-                # Save the combined image to a BytesIO object
-                with BytesIO() as output:
-                    combined_image.save(output, format='PNG')
-                    output.seek(0)
-                    combined_image_file = discord.File(output, filename='combined_traits.png')
-                    await ctx.send(file=combined_image_file)
+                # Encode the combined image with this command's output settings
+                data, info = encode_image(combined_image, self.output)
+                print(describe("combined traits", info))
+                combined_image_file = discord.File(BytesIO(data), filename=file_name('combined_traits', self.output))
+                await ctx.send(file=combined_image_file)
             else:
                 print("No images available to display.")
 
         except Exception as e:
             print(f"An error occurred: {str(e)}")
 
-async def setup(bot, apikey, latest_version):
-    await bot.add_cog(TrainerCommands(bot, apikey, latest_version))
+async def setup(bot, apikey, latest_version, static_data, asset_cache, output=None):
+    await bot.add_cog(TrainerCommands(bot, apikey, latest_version, static_data, asset_cache, output))
@@ -1,40 +1,46 @@
 import discord
 from discord.ext import commands
-import psycopg2
-import os
 import re
 import asyncio
+from utils.riot import RiotAPIError
+
+# What Riot answers for a PUUID it no longer recognizes
+STALE_PUUID_STATUSES = (400, 404)
 
 class UserSettings(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, riot, database):
         self.bot = bot
-        self.create_tables()
+        self.riot = riot
+        self.db = database
 
-    def get_db_connection(self):
-        """Get a connection to the PostgreSQL database"""
-        DATABASE_URL = os.environ.get('DATABASE_URL')
-        return psycopg2.connect(DATABASE_URL, sslmode='require')
+    async def cog_load(self):
+        await self.db.run(self.create_tables)
 
     def create_tables(self):
         """Create necessary database tables if they don't exist"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tft_settings (
-                    discord_id BIGINT PRIMARY KEY,
-                    tft_name VARCHAR(255) NOT NULL,
-                    tft_tag VARCHAR(255) NOT NULL,
-                    region VARCHAR(50) DEFAULT 'americas',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            conn.commit()
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS tft_settings (
+                        discord_id BIGINT PRIMARY KEY,
+                        tft_name VARCHAR(255) NOT NULL,
+                        tft_tag VARCHAR(255) NOT NULL,
+                        region VARCHAR(50) DEFAULT 'americas',
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                # PUUIDs never change for a Riot ID, so they are resolved once and stored with the registration
+                cursor.execute('ALTER TABLE tft_settings ADD COLUMN IF NOT EXISTS puuid VARCHAR(100)')
+                cursor.execute('ALTER TABLE tft_settings ADD COLUMN IF NOT EXISTS platform VARCHAR(10)')
         except Exception as e:
             print(f"Error creating tables: {e}")
-        finally:
-            cursor.close()
-            conn.close()
+
+    def get_registration(self, discord_id):
+        """Get a user's (tft_name, tft_tag, region, puuid, platform), or None if they have not registered"""
+        with self.db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute('SELECT tft_name, tft_tag, region, puuid, platform FROM tft_settings WHERE discord_id = %s',
+                           (discord_id,))
+            return cursor.fetchone()
 
     VALID_REGIONS = ['americas', 'europe', 'asia', 'sea']
 
@@ -65,22 +71,20 @@ class UserSettings(commands.Cog):
         # Split riot_id into name and tag
         name, tag = riot_id.split('#')
 
+        # Resolve the PUUID and TFT platform once here so profile commands can skip the lookups
+        puuid, platform = None, None
         try:
-            conn = self.get_db_connection()
-            cursor = conn.cursor()
-            
-            # Use INSERT ... ON CONFLICT for upsert operation
-            cursor.execute('''
-                INSERT INTO tft_settings (discord_id, tft_name, tft_tag, region)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (discord_id)
-                DO UPDATE SET
-                    tft_name = EXCLUDED.tft_name,
-                    tft_tag = EXCLUDED.tft_tag,
-                    region = EXCLUDED.region
-            ''', (ctx.author.id, name, tag, region))
-            
-            conn.commit()
+            puuid, platform = await self.resolve_riot_ids(name, tag, region)
+        except RiotAPIError as e:
+            if e.status == 404:
+                await ctx.message.add_reaction('❌')
+                await ctx.send(f"Could not find {name}#{tag} in {region}. Please check your name, tag and region.")
+                return
+            # Riot is having trouble; save the registration and resolve the PUUID on first use
+            print(f"Could not resolve PUUID for {name}#{tag}: {e}")
+
+        try:
+            await self.db.run(self.save_settings, ctx.author.id, name, tag, region, puuid, platform)
             # Add checkmark reaction and wait briefly
             await ctx.message.add_reaction('✅')
             await asyncio.sleep(1)  # Wait 1 second for visibility
@@ -92,21 +96,73 @@ class UserSettings(commands.Cog):
         except Exception as e:
             await ctx.message.add_reaction('❌')
             print(f"Error setting user settings: {e}")
-        finally:
-            cursor.close()
-            conn.close()
+
+    def save_settings(self, discord_id, name, tag, region, puuid, platform):
+        """Insert or replace a user's registration"""
+        with self.db.connection() as conn, conn.cursor() as cursor:
+            # Use INSERT ... ON CONFLICT for upsert operation
+            cursor.execute('''
+                INSERT INTO tft_settings (discord_id, tft_name, tft_tag, region, puuid, platform)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (discord_id)
+                DO UPDATE SET
+                    tft_name = EXCLUDED.tft_name,
+                    tft_tag = EXCLUDED.tft_tag,
+                    region = EXCLUDED.region,
+                    puuid = EXCLUDED.puuid,
+                    platform = EXCLUDED.platform
+            ''', (discord_id, name, tag, region, puuid, platform))
 
     def get_user_tft_name(self, discord_id: int) -> tuple:
         """Get a user's TFT name, tag, and region from their Discord ID"""
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        try:
+        with self.db.connection() as conn, conn.cursor() as cursor:
             cursor.execute('SELECT tft_name, tft_tag, region FROM tft_settings WHERE discord_id = %s', (discord_id,))
             result = cursor.fetchone()
             return result if result else None
-        finally:
-            cursor.close()
-            conn.close()
 
-async def setup(bot):
-    await bot.add_cog(UserSettings(bot))
+    async def resolve_riot_ids(self, name, tag, region):
+        """Look up the PUUID and TFT platform (na1, euw1, ...) for a Riot ID"""
+        account = await self.riot.get_account_by_riot_id(name, tag, region)
+        puuid = account['puuid']
+        platform = await self.riot.get_tft_region(puuid, region)
+        return puuid, platform
+
+    def save_riot_ids(self, discord_id, puuid, platform):
+        """Store a resolved PUUID and platform alongside a registration"""
+        try:
+            with self.db.connection() as conn, conn.cursor() as cursor:
+                cursor.execute('UPDATE tft_settings SET puuid = %s, platform = %s WHERE discord_id = %s',
+                               (puuid, platform, int(discord_id)))
+        except Exception as e:
+            print(f"Error saving PUUID for {discord_id}: {e}")
+
+    async def get_riot_ids(self, discord_id, name, tag, region, puuid=None, platform=None, refresh=False):
+        """Get a registration's PUUID and platform, resolving and storing them only when missing.
+
+        Pass refresh=True after a Riot call with the stored PUUID failed to resolve it again.
+        """
+        if puuid and platform and not refresh:
+            return puuid, platform
+        puuid, platform = await self.resolve_riot_ids(name, tag, region)
+        await self.db.run(self.save_riot_ids, discord_id, puuid, platform)
+        return puuid, platform
+
+    async def with_riot_ids(self, discord_id, name, tag, region, puuid, platform, call):
+        """Await `call(puuid, platform)` with a registration's Riot IDs and return (puuid, platform, result).
+
+        If Riot rejects the stored PUUID (400/404), the IDs are resolved again
+        and the call is retried once. Any other error is raised as is.
+        """
+        stored = bool(puuid and platform)
+        puuid, platform = await self.get_riot_ids(discord_id, name, tag, region, puuid, platform)
+        try:
+            return puuid, platform, await call(puuid, platform)
+        except RiotAPIError as e:
+            # IDs that were just resolved cannot be stale
+            if not stored or e.status not in STALE_PUUID_STATUSES:
+                raise
+        puuid, platform = await self.get_riot_ids(discord_id, name, tag, region, refresh=True)
+        return puuid, platform, await call(puuid, platform)
+
+async def setup(bot, riot, database):
+    await bot.add_cog(UserSettings(bot, riot, database))
@@ -2,11 +2,20 @@ import discord
 from discord.ext import commands, tasks
 import psycopg2
 import asyncio
-import aiohttp
 import time
 import json
 import os
 import importlib
+from utils.http_client import HttpClient
+from utils.riot import RiotClient
+from utils.ratelimit import RiotRateLimiter
+from utils.assets import AssetCache
+from utils.match_cache import MatchCache
+from utils.static_data import StaticDataRegistry
+from utils.portraits import PortraitIndex
+from utils.workers import WorkerPool
+from utils.database import Database
+from utils.archive import MessageArchive
 
 # Set up the bot with a command prefix
 intents = discord.Intents.default()
@@ -25,70 +34,92 @@ with open(config_path, 'r') as config_file:
 
 # Load static data from config
 versions_url = config['versions_url']
-base_champions_url = config['base_champions_url']
+static_data_url = config['static_data_url']
 shop_odds = config['shop_odds']
 set_number = config['set']
 latest_version = None
-champions_data = {}
 
-def connect_to_db():
-    DATABASE_URL = os.environ.get('DATABASE_URL')
-    try:
-        return psycopg2.connect(DATABASE_URL, sslmode='require')
-    except psycopg2.Error as e:
-        print(f"Error connecting to the database: {e}")
-        return None
-
-# Check if a message already exists in a table
-def message_exists(cursor, table_name, message_id):
-    query = f"SELECT 1 FROM {table_name} WHERE message_id = %s"
-    cursor.execute(query, (message_id,))
-    return cursor.fetchone() is not None
-
-# Insert a message into the appropriate table
-def insert_message_to_db(connection, cursor, table_name, message):
-    try:
-        query = f"""
-        INSERT INTO {table_name} (message_id, author_id, author_name, content, created_at)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (message.id, message.author.id, str(message.author), message.content, message.created_at))
-        connection.commit()
-        print(f"Inserted message {message.id} by {message.author} into {table_name}.")
-    except Exception as e:
-        connection.rollback()  # Rollback on failure
-        print(f"Error inserting message: {e}")
-
-# Fetch new messages from a channel and store them in the appropriate table
-async def fetch_new_messages(channel, table_name, connection, cursor):
-    print(f"Fetching messages from channel {channel.name}...")
-
-    async for message in channel.history(limit=None):
-        if message_exists(cursor, table_name, message.id):
-            print(f"Message {message.id} already in {table_name}, stopping.")
-            break
-        insert_message_to_db(connection, cursor, table_name, message)
-
-# Task loop to fetch messages every hour
+# One pooled HTTP client shared by every cog so connections are reused
+http_config = config.get('http', {})
+http_client = HttpClient(
+    limit=http_config.get('limit', 100),
+    limit_per_host=http_config.get('limit_per_host', 20),
+    dns_cache_ttl=http_config.get('dns_cache_ttl', 300),
+    keepalive_timeout=http_config.get('keepalive_timeout', 60),
+    timeout=http_config.get('timeout', 30)
+)
+
+# Async Riot API client; every call is paced by per-routing-value token buckets
+riot_limiter = RiotRateLimiter(app_limits=config.get('riot_app_rate_limit', "20:1,100:120"))
+riot_client = RiotClient(http_client, apikey, riot_limiter, timeout=http_config.get('riot_timeout', 10))
+
+# Champion, trait, item, tactician and regalia data, loaded once per patch and shared with the cogs
+static_data = StaticDataRegistry(http_client, static_data_url)
+
+# Shared cache for static ddragon/communitydragon art, invalidated on every new patch
+asset_cache_config = config.get('asset_cache', {})
+asset_cache = AssetCache(
+    http_client,
+    cache_dir=os.getenv('asset_cache_dir'),
+    memory_bytes=asset_cache_config.get('memory_mb', 64) * 1024 * 1024,
+    disk_bytes=asset_cache_config.get('disk_mb', 512) * 1024 * 1024
+)
+
+# character_id -> CommunityDragon portrait filename, rebuilt when the set or patch changes
+portrait_index = PortraitIndex(http_client, cache_dir=os.getenv('portrait_cache_dir'))
+
+# Pillow rendering runs here instead of on the event loop
+render_pool_config = config.get('render_pool', {})
+render_pool = WorkerPool(kind=render_pool_config.get('kind', 'process'), max_workers=render_pool_config.get('workers'))
+background_tasks = set()
+
+# One Postgres connection pool shared by every cog, the match cache and the archiver
+database_config = config.get('database', {})
+database = Database(
+    os.environ.get('DATABASE_URL'),
+    min_connections=database_config.get('min_connections', 1),
+    max_connections=database_config.get('max_connections', 5),
+    health_check_seconds=database_config.get('health_check_seconds', 30),
+    slow_query_ms=database_config.get('slow_query_ms', 250)
+)
+
+# Finished matches never change, so .last keeps them (and spills them to Postgres) by match ID
+match_cache_config = config.get('match_cache', {})
+match_cache = MatchCache(
+    max_matches=match_cache_config.get('max_matches', 256),
+    latest_ttl=match_cache_config.get('latest_ttl', 60),
+    database=database if match_cache_config.get('persist', True) else None,
+    max_age_days=match_cache_config.get('max_age_days', 30)
+)
+
+# Channels copied into Postgres for the quote commands, channel ID -> archive table
+ARCHIVED_CHANNELS = {
+    1113421046029242381: "general_messages",
+    1113429363950616586: "advice_messages",
+    1113495131841110126: "malding_messages"
+}
+archive_config = config.get('archive', {})
+archive = MessageArchive(
+    database,
+    ARCHIVED_CHANNELS,
+    batch_size=archive_config.get('batch_size', 500),
+    flush_rows=archive_config.get('flush_rows', 100)
+)
+
+# Task loop to fetch messages every hour; new messages are archived live by cogs.archiver, this fills any gaps
 @tasks.loop(hours=1)
 async def fetch_messages_every_hour(client):
-    db_connection = connect_to_db()
-    if db_connection:
-        cursor = db_connection.cursor()
+    print(f"HTTP client stats: {http_client.stats()}")
+    print(f"Riot rate limiter stats: {riot_limiter.stats()}")
+    print(f"Match cache stats: {match_cache.stats()}")
+    print(f"Render pool stats: {render_pool.stats()}")
+    print(f"Database stats: {database.stats()}")
+    print(f"Archive stats: {archive.stats()}")
 
-        general_channel = client.get_channel(1113421046029242381)  # Replace with actual channel ID
-        advice_channel = client.get_channel(1113429363950616586)   # Replace with actual channel ID
-        malding_channel = client.get_channel(1113495131841110126)  # Replace with actual channel ID
-
-        if general_channel:
-            await fetch_new_messages(general_channel, "general_messages", db_connection, cursor)
-        if advice_channel:
-            await fetch_new_messages(advice_channel, "advice_messages", db_connection, cursor)
-        if malding_channel:
-            await fetch_new_messages(malding_channel, "malding_messages", db_connection, cursor)
-
-        cursor.close()
-        db_connection.close()
+    try:
+        await archive.sync(client)
+    except psycopg2.Error as e:
+        print(f"Error archiving messages: {e}")
 
 @bot.event
 async def on_ready():
@@ -99,41 +130,43 @@ async def on_ready():
     fetch_messages_every_hour.start(bot)
 
     await fetch_latest_version()
-    await fetch_champions_data()
+    await static_data.load(latest_version)
+
+    # Build the portrait index in the background; .last falls back to per-unit lookups until it is ready
+    set_champions = [champion_id for champion_id in static_data.champions if champion_id.startswith(f"TFT{set_number}_")]
+    task = asyncio.create_task(portrait_index.build(set_number, latest_version, set_champions))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
 
-    await load_cogs(bot, config=config, champions_data=champions_data,
-                    latest_version=latest_version, shop_odds=shop_odds)
+    await load_cogs(bot, config=config, latest_version=latest_version, shop_odds=shop_odds)
 
     print(f'Bot {bot.user} is ready.')
 
 
 async def fetch_latest_version():
     global latest_version
-    async with aiohttp.ClientSession() as session:
-        async with session.get(versions_url) as response:
-            if response.status == 200:
-                versions = await response.json()
-                if versions:
-                    latest_version = versions[0]
-                    print(f"Current TFT Patch: {latest_version}")
-            else:
-                print(f"Failed to fetch versions data: {response.status}")
-
-
-async def fetch_champions_data():
-    global champions_data
-    url = base_champions_url.format(version=latest_version)
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                champions_data = data.get('data', {})
-            else:
-                print(f"Failed to fetch champions data: {response.status}")
-
-
-async def load_cogs(bot, config=None, champions_data=None, latest_version=None, shop_odds=None):
+    async with http_client.get(versions_url) as response:
+        if response.status == 200:
+            versions = await response.json()
+            if versions:
+                latest_version = versions[0]
+                print(f"Current TFT Patch: {latest_version}")
+                asset_cache.set_version(latest_version)
+        else:
+            print(f"Failed to fetch versions data: {response.status}")
+
+
+# Cogs whose setup only takes the bot and the shared database
+DATABASE_COGS = {'cogs.commandnotfound', 'cogs.cw', 'cogs.malding', 'cogs.misc', 'cogs.nw', 'cogs.ragebait',
+                 'cogs.suggestion'}
+# Keyword quote commands that search the message archive
+ARCHIVE_COGS = {'cogs.fault', 'cogs.psyop'}
+
+
+async def load_cogs(bot, config=None, latest_version=None, shop_odds=None):
     cogs_dir = os.path.join(os.path.dirname(__file__), 'cogs')
+    # Per-command codec and compression settings for generated images
+    image_output = config.get('image_output', {})
 
     for filename in os.listdir(cogs_dir):
         if filename.endswith('.py') and filename != '__init__.py':
@@ -154,21 +187,29 @@ async def load_cogs(bot, config=None, champions_data=None, latest_version=None,
 
                 if hasattr(cog_module, 'setup'):
                     if cog_name == 'cogs.roll':
-                        await cog_module.setup(bot, champions_data, latest_version, shop_odds, set_number)
+                        await cog_module.setup(bot, static_data, latest_version, shop_odds, set_number, asset_cache, image_output.get('roll'), config.get('shop'))
                     elif cog_name == 'cogs.last':
-                        await cog_module.setup(bot, apikey, latest_version, set_number)
+                        await cog_module.setup(bot, riot_client, latest_version, set_number, static_data, asset_cache, portrait_index, match_cache, render_pool, config.get('last'), image_output.get('last'))
                     elif cog_name == 'cogs.stats':
-                        await cog_module.setup(bot, apikey, latest_version, set_number)
+                        await cog_module.setup(bot, riot_client, latest_version, set_number, static_data)
                     elif cog_name == 'cogs.trainer':
-                        await cog_module.setup(bot, apikey, latest_version)
+                        await cog_module.setup(bot, apikey, latest_version, static_data, asset_cache, image_output.get('trainer'))
                     elif cog_name == 'cogs.top':
-                        await cog_module.setup(bot, apikey)
+                        await cog_module.setup(bot, riot_client)
                     elif cog_name == 'cogs.leaderboard':
-                        await cog_module.setup(bot, apikey, set_number)                        
+                        await cog_module.setup(bot, riot_client, database, set_number, config.get('leaderboard'))
                     elif cog_name == 'cogs.cutoffs':
-                        await cog_module.setup(bot, apikey, latest_version)
+                        await cog_module.setup(bot, riot_client, latest_version)
+                    elif cog_name == 'cogs.user_settings':
+                        await cog_module.setup(bot, riot_client, database)
                     elif cog_name == 'cogs.lookup':
-                        await cog_module.setup(bot, set_number)
+                        await cog_module.setup(bot, set_number, http_client)
+                    elif cog_name == 'cogs.archiver':
+                        await cog_module.setup(bot, archive, config.get('archive', {}).get('flush_seconds', 5))
+                    elif cog_name in ARCHIVE_COGS:
+                        await cog_module.setup(bot, archive)
+                    elif cog_name in DATABASE_COGS:
+                        await cog_module.setup(bot, database)
                     else:
                         await cog_module.setup(bot)
                 else:
@@ -179,6 +220,24 @@ async def load_cogs(bot, config=None, champions_data=None, latest_version=None,
                 print(f"Failed to load extension {cog_name}: {e}")
 
 
+close_bot = bot.close
+
+
+async def close():
+    """Stop the bot, then release the shared HTTP session, database connections and render workers"""
+    fetch_messages_every_hour.cancel()
+    try:
+        # Unloads the cogs first, so the archiver still has the database for its last flush
+        await close_bot()
+    finally:
+        await http_client.close()
+        database.close()
+        render_pool.shutdown()
+
+bot.close = close
+
+# Fork the render workers before the database, HTTP and gateway threads exist
+render_pool.start()
 
 # Run the bot using your token
 bot.run(botkey)
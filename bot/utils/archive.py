@@ -0,0 +1,250 @@
+import asyncio
+
+import discord
+import psycopg2
+from psycopg2.extras import execute_values
+
+
+class MessageArchive:
+    """Copies messages from a few channels into per-channel Postgres tables.
+
+    `channels` maps a channel ID to its archive table. The newest archived
+    message ID of every channel is kept in `archive_state`, so each sync only
+    asks Discord for messages `after` it, oldest first. A sync writes all new
+    rows with multi-row inserts (`batch_size` rows per statement) and moves the
+    high-water marks forward in the same transaction. A unique index on
+    message_id plus ON CONFLICT DO NOTHING makes re-archiving a message a no-op.
+
+    New messages are also buffered as they arrive (`add`) and written in
+    batches by `flush`. `live_since` holds the first message of each channel's
+    current gap-free live window. `sync` only fetches the history before that
+    message; once it has, the channel is covered and live flushes move its
+    high-water mark themselves, so later syncs skip it. A reconnect
+    (`reset_live`) or a failed flush ends the window and the next sync fills
+    the gap.
+
+    Message content has pg_trgm GIN indexes, so `random_quote` can find
+    messages containing a phrase without scanning the whole archive.
+    """
+
+    def __init__(self, database, channels, batch_size=500, flush_rows=100):
+        self.database = database
+        self.channels = channels
+        self.batch_size = batch_size
+        self.flush_rows = flush_rows
+        self.tables_ready = False
+        self.archived = 0
+        self.buffer = {}
+        self.buffered = 0
+        self.flush_lock = asyncio.Lock()
+        self.live_since = {}
+        self.covered = set()
+        self.flushes = 0
+        self.live_archived = 0
+        self.dropped = 0
+
+    def create_tables(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archive_state (
+                    channel_id BIGINT PRIMARY KEY,
+                    last_message_id BIGINT NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+            ''')
+            for table in self.channels.values():
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        message_id BIGINT NOT NULL,
+                        author_id BIGINT NOT NULL,
+                        author_name TEXT,
+                        content TEXT,
+                        created_at TIMESTAMPTZ
+                    )
+                ''')
+                index = f'{table}_message_id_key'
+                cursor.execute('SELECT to_regclass(%s) IS NULL', (index,))
+                if cursor.fetchone()[0]:
+                    # The old per-row archiver had no constraint, drop any duplicates it left behind first
+                    cursor.execute(f'''
+                        DELETE FROM {table} a USING {table} b
+                        WHERE a.message_id = b.message_id AND a.ctid > b.ctid
+                    ''')
+                    cursor.execute(f'CREATE UNIQUE INDEX {index} ON {table} (message_id)')
+            self.create_search_indexes(cursor)
+        conn.commit()
+        self.tables_ready = True
+
+    def create_search_indexes(self, cursor):
+        """Trigram indexes that let ILIKE '%phrase%' use an index scan"""
+        cursor.execute('SAVEPOINT search_indexes')
+        try:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table in self.channels.values():
+                cursor.execute(f'''
+                    CREATE INDEX IF NOT EXISTS {table}_content_trgm_idx
+                    ON {table} USING gin (content gin_trgm_ops)
+                ''')
+            cursor.execute('RELEASE SAVEPOINT search_indexes')
+        except psycopg2.Error as e:
+            # pg_trgm may not be installable with this role; phrase searches still work, just slower
+            cursor.execute('ROLLBACK TO SAVEPOINT search_indexes')
+            print(f"Could not create archive search indexes: {e}")
+
+    def load_high_water_marks(self):
+        """channel ID -> newest archived message ID, seeded from the archive tables on first run"""
+        with self.database.connection() as conn:
+            if not self.tables_ready:
+                self.create_tables(conn)
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT channel_id, last_message_id FROM archive_state WHERE channel_id = ANY(%s)',
+                               (list(self.channels),))
+                marks = dict(cursor.fetchall())
+                for channel_id, table in self.channels.items():
+                    if channel_id not in marks:
+                        cursor.execute(f'SELECT MAX(message_id) FROM {table}')
+                        marks[channel_id] = cursor.fetchone()[0]
+        return marks
+
+    def store(self, batches, advance=()):
+        """Write every channel's new rows and move the high-water marks of the channels in `advance`, in one transaction.
+
+        `batches` maps a channel ID to a list of (message_id, author_id,
+        author_name, content, created_at) rows, oldest first. Returns the number
+        of rows that were not already archived.
+        """
+        inserted = 0
+        with self.database.connection() as conn:
+            if not self.tables_ready:
+                self.create_tables(conn)
+            cursor = conn.cursor()
+            for channel_id, rows in batches.items():
+                if not rows:
+                    continue
+                table = self.channels[channel_id]
+                written = execute_values(cursor, f'''
+                    INSERT INTO {table} (message_id, author_id, author_name, content, created_at)
+                    VALUES %s
+                    ON CONFLICT (message_id) DO NOTHING
+                    RETURNING 1
+                ''', rows, page_size=self.batch_size, fetch=True)
+                inserted += len(written)
+                if channel_id not in advance:
+                    continue
+                cursor.execute('''
+                    INSERT INTO archive_state (channel_id, last_message_id) VALUES (%s, %s)
+                    ON CONFLICT (channel_id) DO UPDATE SET
+                        last_message_id = GREATEST(archive_state.last_message_id, EXCLUDED.last_message_id),
+                        updated_at = NOW()
+                ''', (channel_id, rows[-1][0]))
+            cursor.close()
+        return inserted
+
+    @staticmethod
+    def message_row(message):
+        return message.id, message.author.id, str(message.author), message.content, message.created_at
+
+    async def fetch_new_messages(self, channel, last_message_id, before_message_id=None):
+        """Messages posted in `channel` after `last_message_id` (and before `before_message_id`), oldest first"""
+        after = discord.Object(id=last_message_id) if last_message_id else None
+        before = discord.Object(id=before_message_id) if before_message_id else None
+        return [self.message_row(message)
+                async for message in channel.history(limit=None, after=after, before=before, oldest_first=True)]
+
+    async def sync(self, client):
+        """Archive whatever the live listener missed in the archived channels since the last sync"""
+        marks = await self.database.run(self.load_high_water_marks)
+
+        batches = {}
+        windows = {}
+        for channel_id, table in self.channels.items():
+            # Live flushes already keep this channel's mark current
+            if channel_id in self.covered:
+                continue
+            channel = client.get_channel(channel_id)
+            if channel is None:
+                continue
+            windows[channel_id] = self.live_since.get(channel_id)
+            print(f"Fetching messages from channel {channel.name}...")
+            batches[channel_id] = await self.fetch_new_messages(channel, marks.get(channel_id), windows[channel_id])
+
+        inserted = await self.database.run(self.store, batches, batches.keys())
+        # Everything before each live window is archived now, unless the window ended while we were fetching
+        for channel_id, window in windows.items():
+            if window is not None and self.live_since.get(channel_id) == window:
+                self.covered.add(channel_id)
+
+        self.archived += inserted
+        fetched = sum(len(rows) for rows in batches.values())
+        print(f"Archived {inserted} new messages ({fetched} fetched) from {len(batches)} channels")
+        return inserted
+
+    def find_random_quote(self, phrase, exclude_authors=()):
+        """A random distinct archived message containing `phrase` (case-insensitive), or None"""
+        pattern = '%' + phrase.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        # UNION dedupes repeated messages so every distinct quote is equally likely
+        query = ' UNION '.join(
+            f'SELECT content FROM {table} WHERE content ILIKE %(pattern)s AND author_id <> ALL(%(exclude)s)'
+            for table in self.channels.values()
+        )
+        with self.database.connection() as conn:
+            if not self.tables_ready:
+                self.create_tables(conn)
+            with conn.cursor() as cursor:
+                cursor.execute(f'SELECT content FROM ({query}) AS matches ORDER BY RANDOM() LIMIT 1',
+                               {'pattern': pattern, 'exclude': list(exclude_authors)})
+                row = cursor.fetchone()
+        return row[0] if row else None
+
+    async def random_quote(self, phrase, exclude_authors=()):
+        """Async `find_random_quote`, run on the database's worker threads"""
+        return await self.database.run(self.find_random_quote, phrase, exclude_authors)
+
+    def reset_live(self):
+        """End every live window, e.g. after a reconnect that may have missed messages"""
+        self.live_since.clear()
+        self.covered.clear()
+
+    def end_live_window(self, channel_ids):
+        for channel_id in channel_ids:
+            self.live_since.pop(channel_id, None)
+            self.covered.discard(channel_id)
+
+    def add(self, message):
+        """Buffer a message from an archived channel. Returns how many rows are waiting to be flushed."""
+        if message.channel.id in self.channels:
+            self.live_since.setdefault(message.channel.id, message.id)
+            self.buffer.setdefault(message.channel.id, []).append(self.message_row(message))
+            self.buffered += 1
+        return self.buffered
+
+    async def flush(self):
+        """Write the buffered messages in one transaction"""
+        async with self.flush_lock:
+            if not self.buffered:
+                return 0
+            batches, count = self.buffer, self.buffered
+            self.buffer, self.buffered = {}, 0
+            # Only covered channels have everything before these rows archived already
+            advance = self.covered & batches.keys()
+            try:
+                inserted = await self.database.run(self.store, batches, advance)
+            except Exception as e:
+                # A gap in the live window: the next sync picks these up from channel history
+                self.end_live_window(batches.keys())
+                self.dropped += count
+                print(f"Error flushing {count} buffered messages: {e}")
+                return 0
+            self.flushes += 1
+            self.live_archived += inserted
+            return inserted
+
+    def stats(self):
+        return {
+            'archived': self.archived,
+            'live_archived': self.live_archived,
+            'flushes': self.flushes,
+            'buffered': self.buffered,
+            'dropped': self.dropped,
+            'covered_channels': len(self.covered)
+        }
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image, ImageDraw
+from urllib.parse import urlparse
+
+from utils.cache import LRUCache
+
+
+def make_variant(data, size, mode, mask=None):
+    """Resize an asset for pasting and return its raw pixel bytes.
+
+    `mask='ellipse'` bakes a round cutout into the alpha channel of an RGBA
+    variant, so it can be pasted with itself as the mask.
+    """
+    img = Image.open(BytesIO(data)).resize(size)
+    if mask == 'ellipse':
+        img = img.convert('RGB')
+        alpha = Image.new('L', size, 0)
+        ImageDraw.Draw(alpha).ellipse([0, 0, size[0], size[1]], fill=255)
+        img.putalpha(alpha)
+    elif mask is not None:
+        raise ValueError(f"Unknown variant mask: {mask}")
+    else:
+        img = img.convert(mode)
+    return img.tobytes()
+
+
+class AssetCache:
+    """Patch-scoped cache for static Data Dragon / CommunityDragon art.
+
+    Assets are keyed by a hash of the current patch and the asset path, kept in an
+    in-memory LRU tier and backed by a size-bounded disk tier. Calling
+    `set_version` with a new patch drops both tiers.
+    """
+
+    def __init__(self, http, cache_dir=None, memory_bytes=64 * 1024 * 1024, disk_bytes=512 * 1024 * 1024):
+        self.http = http
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'shittytftbot', 'assets')
+        self.disk_bytes = disk_bytes
+        self.memory = LRUCache(memory_bytes, sizeof=len)
+        self.version = None
+        self.disk_size = 0
+        self.network_requests = 0
+        self.inflight = {}
+
+    def set_version(self, version):
+        """Switch the cache to a patch, invalidating everything cached for other patches"""
+        if version == self.version:
+            return
+        print(f"Asset cache switching from patch {self.version} to {version}")
+        self.version = version
+        self.memory.clear()
+
+        # Only the current patch directory is kept on disk
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for entry in os.scandir(self.cache_dir):
+            if entry.name != str(version):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        os.makedirs(self.version_dir(), exist_ok=True)
+        self.disk_size = sum(entry.stat().st_size for entry in os.scandir(self.version_dir()))
+
+    def version_dir(self):
+        return os.path.join(self.cache_dir, str(self.version))
+
+    def key(self, url, variant=None):
+        """Content-addressed key from the patch, the asset path and, for resized copies, the variant"""
+        parsed = urlparse(url)
+        return hashlib.sha256(f"{self.version}:{parsed.netloc}{parsed.path}:{variant}".encode()).hexdigest()
+
+    def read_disk(self, key):
+        path = os.path.join(self.version_dir(), key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Bump mtime so eviction stays least-recently-used
+            return data
+        except OSError:
+            return None
+
+    def write_disk(self, key, data):
+        if len(data) > self.disk_bytes:
+            return
+        try:
+            os.makedirs(self.version_dir(), exist_ok=True)
+            self.evict_disk(len(data))
+            path = os.path.join(self.version_dir(), key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.disk_size += len(data)
+        except OSError as e:
+            print(f"Failed to write asset to disk cache: {e}")
+
+    def evict_disk(self, incoming):
+        """Remove the least recently used files until `incoming` bytes fit"""
+        if self.disk_size + incoming <= self.disk_bytes:
+            return
+        entries = sorted(os.scandir(self.version_dir()), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self.disk_size + incoming <= self.disk_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                self.disk_size -= size
+            except OSError:
+                pass
+
+    async def download(self, url):
+        self.network_requests += 1
+        print(f"Downloading asset from: {url}")
+        async with self.http.get(url) as response:
+            if response.status == 200:
+                return await response.read()
+            print(f"Failed to download asset from {url}: {response.status}")
+            return None
+
+    async def fetch(self, url):
+        """Get the raw bytes of an asset, hitting the network only on a cache miss"""
+        key = self.key(url)
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        data = self.read_disk(key)
+        if data is not None:
+            self.memory.put(key, data)
+            return data
+
+        # Share one download between concurrent requests for the same asset
+        if key in self.inflight:
+            return await self.inflight[key]
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        data = None
+        try:
+            data = await self.download(url)
+            if data is not None:
+                self.memory.put(key, data)
+                self.write_disk(key, data)
+        except Exception as e:
+            print(f"Failed to download asset from {url}: {str(e)}")
+        finally:
+            del self.inflight[key]
+            future.set_result(data)
+        return data
+
+    async def fetch_image(self, url):
+        """Get an asset as a PIL Image"""
+        data = await self.fetch(url)
+        if data is None:
+            return None
+        try:
+            return Image.open(BytesIO(data))
+        except Exception as e:
+            print(f"Failed to decode image from {url}: {str(e)}")
+            return None
+
+    async def fetch_variant(self, url, size, mode, mask=None):
+        """Get an asset resized to `size` in `mode` as raw pixel bytes, made once per asset per patch"""
+        key = self.key(url, f"{size[0]}x{size[1]}-{mode}-{mask}")
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        data = self.read_disk(key)
+        if data is None:
+            source = await self.fetch(url)
+            if source is None:
+                return None
+            try:
+                data = make_variant(source, size, mode, mask)
+            except Exception as e:
+                print(f"Failed to resize asset from {url}: {str(e)}")
+                return None
+            self.write_disk(key, data)
+        self.memory.put(key, data)
+        return data
+
+    def stats(self):
+        return {'memory': self.memory.stats(), 'disk_size': self.disk_size, 'network_requests': self.network_requests}
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Size-bounded least-recently-used cache.
+
+    Entries are weighed with `sizeof` (1 per entry by default) and the oldest
+    entries are evicted once the total weight goes over `max_size`.
+    """
+
+    def __init__(self, max_size, sizeof=None):
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        weight = self.sizeof(value)
+        if weight > self.max_size:
+            # Never cache something that would flush the whole cache
+            return
+        if key in self.entries:
+            self.size -= self.sizeof(self.entries.pop(key))
+        self.entries[key] = value
+        self.size += weight
+        while self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+
+    def pop(self, key, default=None):
+        if key in self.entries:
+            value = self.entries.pop(key)
+            self.size -= self.sizeof(value)
+            return value
+        return default
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {'entries': len(self.entries), 'size': self.size, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,197 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+from utils.workers import WorkerPool
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection that knows which Database it belongs to, for query timing"""
+    database = None
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that reports how long every statement took to its Database"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self.connection.database.record_query(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self.connection.database.record_query(query, time.perf_counter() - start)
+
+
+class Database:
+    """Bot-wide pooled Postgres service.
+
+    Connections come from a psycopg2 ThreadedConnectionPool and are borrowed with
+    `connection()`, which commits on success and rolls back on error. A connection
+    that sat idle longer than `health_check_seconds` is checked with `SELECT 1`
+    before it is handed out, and broken connections are closed instead of being
+    returned, so the pool reconnects on the next borrow. Every statement is timed
+    and statements slower than `slow_query_ms` are logged.
+
+    psycopg2 blocks, so async code goes through `run`, which calls a function in
+    a thread pool with one worker per connection and never on the event loop.
+    """
+
+    def __init__(self, dsn, min_connections=1, max_connections=5, sslmode='require',
+                 health_check_seconds=30, slow_query_ms=250, connect_timeout=10):
+        self.dsn = dsn
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.sslmode = sslmode
+        self.health_check_seconds = health_check_seconds
+        self.slow_query_ms = slow_query_ms
+        self.connect_timeout = connect_timeout
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        # Wait for a free connection instead of failing with PoolError when every one is borrowed
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.last_used = {}
+        self.workers = WorkerPool(kind='thread', max_workers=max_connections)
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            'borrows': 0,
+            'health_checks': 0,
+            'reconnects': 0,
+            'errors': 0,
+            'queries': 0,
+            'slow_queries': 0,
+            'query_ms': 0.0,
+            'max_query_ms': 0.0,
+            'wait_ms': 0.0
+        }
+
+    def get_pool(self):
+        """The connection pool, created on first use (and again after `close`)"""
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.min_connections,
+                    self.max_connections,
+                    self.dsn,
+                    sslmode=self.sslmode,
+                    connect_timeout=self.connect_timeout,
+                    connection_factory=PooledConnection,
+                    cursor_factory=TimedCursor
+                )
+            return self.pool
+
+    def is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self.last_used.get(id(conn))
+        # Connections the pool just opened have not had time to go stale
+        if last_used is None or time.monotonic() - last_used < self.health_check_seconds:
+            return True
+
+        self.count('health_checks')
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def discard(self, pool, conn):
+        self.last_used.pop(id(conn), None)
+        try:
+            pool.putconn(conn, close=True)
+        except psycopg2.pool.PoolError:
+            pass
+
+    def acquire(self):
+        pool = self.get_pool()
+        # Stale connections are replaced by fresh ones; give up after a full pool's worth of failures
+        for _ in range(self.max_connections + 1):
+            conn = pool.getconn()
+            conn.database = self
+            if self.is_healthy(conn):
+                return pool, conn
+            self.count('reconnects')
+            self.discard(pool, conn)
+        raise psycopg2.OperationalError("Could not get a working database connection")
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for one unit of work.
+
+        Commits when the block exits normally and rolls back when it raises.
+        Connections that broke (OperationalError/InterfaceError) are dropped.
+        """
+        start = time.perf_counter()
+        self.slots.acquire()
+        pool = conn = None
+        try:
+            pool, conn = self.acquire()
+            self.count('borrows')
+            self.count('wait_ms', (time.perf_counter() - start) * 1000)
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.count('errors')
+            if conn is not None:
+                self.discard(pool, conn)
+                conn = None
+            raise
+        except Exception:
+            self.count('errors')
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                self.last_used[id(conn)] = time.monotonic()
+                pool.putconn(conn, close=bool(conn.closed))
+            self.slots.release()
+
+    async def run(self, func, *args):
+        """Run blocking database work `func(*args)` off the event loop"""
+        return await self.workers.run(func, *args)
+
+    def count(self, name, amount=1):
+        with self.stats_lock:
+            self.counters[name] += amount
+
+    def record_query(self, query, seconds):
+        elapsed_ms = seconds * 1000
+        with self.stats_lock:
+            self.counters['queries'] += 1
+            self.counters['query_ms'] += elapsed_ms
+            self.counters['max_query_ms'] = max(self.counters['max_query_ms'], elapsed_ms)
+            slow = elapsed_ms >= self.slow_query_ms
+            if slow:
+                self.counters['slow_queries'] += 1
+        if slow:
+            if isinstance(query, bytes):
+                query = query.decode(errors='replace')
+            print(f"Slow query ({elapsed_ms:.0f} ms): {' '.join(str(query).split())[:200]}")
+
+    def close(self):
+        self.workers.shutdown()
+        with self.pool_lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
+                self.last_used.clear()
+
+    def stats(self):
+        with self.stats_lock:
+            stats = dict(self.counters)
+        stats['average_query_ms'] = stats['query_ms'] / stats['queries'] if stats['queries'] else 0.0
+        stats['average_wait_ms'] = stats['wait_ms'] / stats['borrows'] if stats['borrows'] else 0.0
+        stats['workers'] = self.workers.stats()
+        return stats
@@ -0,0 +1,74 @@
+import aiohttp
+
+
+class HttpClient:
+    """Bot-wide pooled aiohttp client.
+
+    One ClientSession with per-host connection pools, keep-alive and DNS caching
+    is shared by every cog so TCP/TLS connections are reused between requests.
+    Connection reuse is tracked through aiohttp trace hooks and reported by `stats`.
+    """
+
+    def __init__(self, limit=100, limit_per_host=20, dns_cache_ttl=300, keepalive_timeout=60, timeout=30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session = None
+        self.counters = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+
+    def trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        def counter(name):
+            async def increment(session, context, params):
+                self.counters[name] += 1
+            return increment
+
+        trace.on_request_start.append(counter('requests'))
+        trace.on_connection_create_end.append(counter('connections_created'))
+        trace.on_connection_reuseconn.append(counter('connections_reused'))
+        trace.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace.on_dns_cache_miss.append(counter('dns_cache_misses'))
+        return trace
+
+    @property
+    def session(self):
+        """The shared session, created on first use inside the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[self.trace_config()]
+            )
+        return self._session
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def stats(self):
+        """Request and connection counters, plus the share of requests served on a reused connection"""
+        stats = dict(self.counters)
+        connections = stats['connections_created'] + stats['connections_reused']
+        stats['reuse_ratio'] = stats['connections_reused'] / connections if connections else 0.0
+        return stats
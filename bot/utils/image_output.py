@@ -0,0 +1,71 @@
+import time
+from io import BytesIO
+from PIL import Image
+
+# Output settings used when a command has none configured (plain PNG, Pillow's defaults)
+DEFAULT_OUTPUT = {
+    'format': 'png',       # png or webp
+    'compress_level': 6,   # png: zlib level 0-9, lower is faster and larger
+    'optimize': False,     # png: extra pass for a smaller file
+    'lossless': True,      # webp
+    'quality': 80,         # webp: quality when lossy, effort when lossless
+    'method': 4,           # webp: 0 (fast) to 6 (small)
+    'colors': 0            # quantize to a palette of this many colors first, 0 keeps full color
+}
+
+FORMATS = {'png': 'PNG', 'webp': 'WEBP'}
+
+
+def output_settings(options=None):
+    """Fill in the defaults for a command's output settings"""
+    settings = {**DEFAULT_OUTPUT, **(options or {})}
+    settings['format'] = settings['format'].lower()
+    if settings['format'] not in FORMATS:
+        raise ValueError(f"Unsupported image output format: {settings['format']}")
+    return settings
+
+
+def file_name(base, options=None):
+    """File name with the extension for the configured format, e.g. last_match.webp"""
+    return f"{base}.{output_settings(options)['format']}"
+
+
+def quantize(img, colors):
+    """Reduce flat-colored images to a palette, which makes PNGs much smaller"""
+    if img.mode == 'RGBA':
+        # Median cut does not support alpha
+        return img.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    return img.convert('RGB').quantize(colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+
+
+def encode_image(img, options=None):
+    """Encode an image with a command's output settings.
+
+    Returns the encoded bytes and a dict with the format, encoded size and
+    encode time, so callers can log what each setting costs.
+    """
+    settings = output_settings(options)
+    start = time.perf_counter()
+
+    if settings['colors']:
+        img = quantize(img, settings['colors'])
+
+    if settings['format'] == 'png':
+        params = {'compress_level': settings['compress_level'], 'optimize': settings['optimize']}
+    else:
+        params = {'lossless': settings['lossless'], 'quality': settings['quality'], 'method': settings['method']}
+
+    output = BytesIO()
+    img.save(output, format=FORMATS[settings['format']], **params)
+    data = output.getvalue()
+
+    info = {
+        'format': settings['format'],
+        'size': len(data),
+        'encode_ms': (time.perf_counter() - start) * 1000
+    }
+    return data, info
+
+
+def describe(name, info):
+    return f"Encoded {name} as {info['format']}: {info['size'] / 1024:.1f} KiB in {info['encode_ms']:.1f} ms"
@@ -0,0 +1,105 @@
+import json
+import time
+
+from utils.cache import LRUCache
+
+
+class MatchCache:
+    """Cache of TFT match documents for `.last`.
+
+    Match payloads never change once a game has ended, so they are kept in an
+    in-memory LRU keyed by match ID and, when `database` is given, spilled to
+    Postgres so they survive restarts, with reads and writes run on the
+    database's worker threads. The latest match ID of each PUUID is only
+    trusted for `latest_ttl` seconds since a new game can end at any time.
+    """
+
+    def __init__(self, max_matches=256, latest_ttl=60, database=None, max_age_days=30):
+        self.memory = LRUCache(max_matches)
+        self.latest = LRUCache(max_matches * 4)
+        self.latest_ttl = latest_ttl
+        self.database = database
+        self.max_age_days = max_age_days
+        self.tables_ready = False
+        self.db_hits = 0
+
+    def create_tables(self, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS match_cache (
+                    match_id VARCHAR(40) PRIMARY KEY,
+                    data JSONB NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+            ''')
+            # Keep the spill table bounded, old games are rarely looked up again
+            cursor.execute("DELETE FROM match_cache WHERE created_at < NOW() - make_interval(days => %s)",
+                           (self.max_age_days,))
+            conn.commit()
+            self.tables_ready = True
+        except Exception as e:
+            conn.rollback()
+            print(f"Error creating match cache table: {e}")
+        finally:
+            cursor.close()
+
+    def get_latest(self, puuid):
+        """Get the cached latest match ID for a PUUID, or None if missing or expired"""
+        entry = self.latest.get(puuid)
+        if entry is None:
+            return None
+        match_id, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self.latest.pop(puuid)
+            return None
+        return match_id
+
+    def put_latest(self, puuid, match_id):
+        self.latest.put(puuid, (match_id, time.monotonic() + self.latest_ttl))
+
+    def read_db(self, match_id):
+        try:
+            with self.database.connection() as conn:
+                if not self.tables_ready:
+                    self.create_tables(conn)
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT data FROM match_cache WHERE match_id = %s', (match_id,))
+                    row = cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            print(f"Error reading match {match_id} from the match cache: {e}")
+            return None
+
+    def write_db(self, match_id, data):
+        try:
+            with self.database.connection() as conn:
+                if not self.tables_ready:
+                    self.create_tables(conn)
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                        INSERT INTO match_cache (match_id, data) VALUES (%s, %s)
+                        ON CONFLICT (match_id) DO NOTHING
+                    ''', (match_id, json.dumps(data)))
+        except Exception as e:
+            print(f"Error writing match {match_id} to the match cache: {e}")
+
+    async def get(self, match_id):
+        """Get a match document from memory, falling back to the Postgres spill"""
+        data = self.memory.get(match_id)
+        if data is not None or self.database is None:
+            return data
+
+        data = await self.database.run(self.read_db, match_id)
+        if data is not None:
+            self.db_hits += 1
+            self.memory.put(match_id, data)
+        return data
+
+    async def put(self, match_id, data):
+        self.memory.put(match_id, data)
+        if self.database is not None:
+            await self.database.run(self.write_db, match_id, data)
+
+    def stats(self):
+        return {'matches': self.memory.stats(), 'latest': self.latest.stats(), 'db_hits': self.db_hits}
@@ -0,0 +1,365 @@
+import math
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.image_output import encode_image
+from utils.imaging import GlyphAtlas, paste_colored
+
+# Drawing for the `.last` match card. Everything here is a plain function of
+# bytes and dicts so it can run in a worker thread or process.
+
+# Trait style colors (based on TFT in-game colors)
+TRAIT_COLORS = {
+    0: '#5f5f5f',  # Gray for inactive
+    1: '#bf8f3f',  # Bronze
+    2: '#7e7e7e',  # Silver
+    3: '#ffd700',  # Gold
+    4: '#ff4de1'   # Chromatic/Prismatic
+}
+
+# Champion rarity colors
+RARITY_COLORS = {
+    0: '#808080',  # Gray for 1-cost
+    1: '#11b288',  # Green for 2-cost
+    2: '#207ac7',  # Blue for 3-cost
+    4: '#c440da',  # Purple for 4-cost
+    5: '#ffb93b',  # Gold for special units
+    6: '#ffb93b'   # Gold for 5-cost
+}
+
+# Placement colors
+PLACEMENT_COLORS = {
+    1: '#FFD700',  # Gold
+    2: '#c440da',  # Purple
+    3: '#207ac7',  # Blue
+    4: '#00FF00',  # Green
+    5: '#808080',  # Gray
+    6: '#808080',
+    7: '#808080',
+    8: '#808080'
+}
+
+# Number paths (normalized to 100x100 grid)
+NUMBER_PATHS = {
+    '0': [(30, 20), (70, 20), (70, 80), (30, 80), (30, 20)],  # Added "0"
+    '1': [(50, 20), (50, 80)],  # Simple vertical line for "1"
+    '2': [(30, 20), (70, 20), (70, 50), (30, 50), (30, 80), (70, 80)],
+    '3': [(30, 20), (70, 20), (70, 50), (30, 50), (70, 50), (70, 80), (30, 80)],  # Fixed "3" with middle connection
+    '4': [(30, 20), (30, 50), (70, 50), (70, 20), (70, 80)],
+    '5': [(70, 20), (30, 20), (30, 50), (70, 50), (70, 80), (30, 80)],
+    '6': [(70, 20), (30, 20), (30, 80), (70, 80), (70, 50), (30, 50)],
+    '7': [(30, 20), (70, 20), (70, 80)],
+    '8': [(30, 20), (70, 20), (70, 80), (30, 80), (30, 20), (30, 50), (70, 50)],
+    '9': [(70, 80), (70, 20), (30, 20), (30, 50), (70, 50)]
+}
+
+# Ready-to-paste asset variants as (size, mode, mask), made once per asset per patch by the asset cache
+CHAMPION_VARIANT = ((96, 96), 'RGB', None)
+ITEM_VARIANT = ((32, 32), 'RGB', None)
+TRAIT_VARIANT = ((48, 48), 'RGBA', None)
+TACTICIAN_VARIANT = ((100, 100), 'RGBA', 'ellipse')
+
+# Load font for trait numbers
+FONT = ImageFont.load_default()
+
+# Digit tiles for draw_number, rasterized on first use per size and stroke width (one atlas per worker)
+GLYPHS = GlyphAtlas(NUMBER_PATHS)
+
+
+def draw_number(draw, number, x, y, size, color):
+    """Draw a large number by pasting pre-rasterized vector digits"""
+    # Convert number to string and get number of digits
+    num_str = str(number)
+    num_digits = len(num_str)
+
+    # Calculate spacing and total width
+    digit_spacing = size * 0.4  # Reduced spacing between digits
+    total_width = size + (digit_spacing * (num_digits - 1))  # Total width including spacing
+
+    # Calculate starting x position to center the entire number
+    start_x = x - (total_width - size) / 2
+
+    # Draw each digit
+    for i, digit in enumerate(num_str):
+        if digit in NUMBER_PATHS:
+            # Position each digit with the calculated spacing
+            digit_x = start_x + (i * digit_spacing)
+            GLYPHS.paste(draw._image, digit, digit_x, y, size, color, int(size/10))
+
+
+def draw_large_text(draw, text, x, y, color, scale=2):
+    """Draw text at a larger scale"""
+    # Get original text size
+    text_bbox = draw.textbbox((0, 0), text, font=FONT)
+    text_width = text_bbox[2] - text_bbox[0]
+    text_height = text_bbox[3] - text_bbox[1]
+
+    # Draw the text as an alpha mask
+    text_img = Image.new('L', (text_width * scale, text_height * scale), 0)
+    text_draw = ImageDraw.Draw(text_img)
+    text_draw.text((0, 0), text, font=FONT, fill=255)
+
+    # Scale up the text
+    text_img = text_img.resize((text_width * scale, text_height * scale), Image.NEAREST)
+
+    # Paint the color through the mask onto the main image in one pass
+    paste_colored(draw._image, text_img, (x, y), color)
+
+
+def draw_star(draw, x, y, size):
+    """Draw a star shape using polygon"""
+    outer_radius = size / 2
+    inner_radius = size / 4
+    points = []
+
+    for i in range(10):
+        angle = math.pi / 5 * i - math.pi / 2
+        radius = outer_radius if i % 2 == 0 else inner_radius
+        points.append((
+            x + radius * math.cos(angle),
+            y + radius * math.sin(angle)
+        ))
+
+    draw.polygon(points, fill='white')
+
+
+def draw_star_background(draw, x, y, width, height, num_stars):
+    """Draw a rounded rectangle background with stars"""
+    draw.rectangle([x, y, x + width, y + height], fill='#607D8B')
+
+    star_size = height - 4
+    star_spacing = (width - star_size * num_stars) / (num_stars + 1)
+
+    for i in range(num_stars):
+        star_x = x + star_spacing * (i + 1) + star_size * i + star_size/2
+        star_y = y + height/2
+        draw_star(draw, star_x, star_y, star_size)
+
+
+def draw_bordered_rectangle(draw, x, y, width, height, border_color, fill_color=None, border_width=2):
+    """Draw a rectangle with a border"""
+    draw.rectangle([x, y, x + width, y + height], outline=border_color, fill=fill_color, width=border_width)
+
+
+def build_star_badges():
+    """Pre-draw the star badge for 1-4 stars"""
+    # 4 stars overflow the 44x17 badge, so badges get a transparent margin
+    pad = 8
+    star_badges = {}
+    for num_stars in range(1, 5):
+        badge = Image.new('RGBA', (44 + 1 + 2 * pad, 17 + 1 + 2 * pad), (0, 0, 0, 0))
+        draw_star_background(ImageDraw.Draw(badge), pad, pad, 44, 17, num_stars)
+        star_badges[num_stars] = (badge, pad)
+    return star_badges
+
+
+def draw_trait_icon(draw, img, x, y, icon_img, trait_id, trait_style, num_units):
+    """Draw a trait icon with count and background"""
+    if icon_img:
+        try:
+            bg_color = TRAIT_COLORS.get(trait_style, '#5f5f5f')
+            draw.rectangle([x, y, x + 48, y + 48], fill=bg_color)  # Increased from 32x32
+            img.paste(icon_img, (x, y), icon_img)
+
+            # Draw trait count background circle
+            number_size = 16  # Reduced size for trait count
+            circle_size = number_size + 6  # Smaller circle with less padding
+            circle_x = x + 48 - circle_size + 1  # Moved right by 3 pixels
+            circle_y = y + 48 - circle_size + 1  # Moved down by 3 pixels
+
+            # Draw dark circle background with white border
+            draw.ellipse([circle_x, circle_y, circle_x + circle_size, circle_y + circle_size], 
+                       fill='#2F3136', outline='white')
+
+            # Draw trait count
+            count_text = str(num_units)
+            text_x = circle_x + (circle_size - number_size) // 2
+            text_y = circle_y + (circle_size - number_size) // 2
+            draw_number(draw, count_text, text_x, text_y, number_size, 'white')
+
+            return True
+        except Exception as e:
+            print(f"Error processing trait icon {trait_id}: {str(e)}")
+            return False
+    return False
+
+
+def get_active_traits(player_data):
+    """Get the player's active traits in display order"""
+    active_traits = [trait for trait in player_data.get('traits', []) if trait.get('tier_current', 0) > 0]
+    active_traits.sort(key=lambda x: (-x['tier_current'], -x['style'], x['name']))
+    return active_traits
+
+
+def load_variant(data, variant):
+    """Wrap the raw pixel bytes of an asset variant in a PIL Image without decoding or resizing.
+
+    Returns None for missing data or a buffer of the wrong size, so one bad asset only skips its own image.
+    """
+    if data is None:
+        return None
+    size, mode, _ = variant
+    if len(data) != size[0] * size[1] * Image.getmodebands(mode):
+        print(f"Asset variant {variant} has {len(data)} bytes, skipping it")
+        return None
+    return Image.frombuffer(mode, size, data, 'raw', mode, 0, 1)
+
+
+def render_match_image(player_data, assets, output=None):
+    """Create a horizontal image showing placement, units with stars and items.
+
+    `assets` holds the resolved URLs and a url -> raw pixel bytes map of the
+    pre-resized variant of every image. The image is encoded with the `output`
+    settings and returned as bytes along with the encode stats, so this can run
+    in a worker process.
+    """
+    images = assets['images']
+
+    # Calculate dimensions
+    unit_width = 120
+    unit_spacing = 10  # Reduced spacing between units
+    left_margin = 265  # Increased from 200 to give more space for summoner icon
+    right_margin = 20
+    num_units = len(player_data['units'])
+    width = left_margin + (unit_width + unit_spacing) * num_units + right_margin
+    height = 220  # Increased from 200 to add padding
+
+    # Create image
+    img = Image.new('RGB', (width, height), color='#36393F')
+    draw = ImageDraw.Draw(img)
+
+    # Draw placement box
+    placement = player_data['placement']
+    placement_color = PLACEMENT_COLORS.get(placement, '#808080')
+
+    # Create darker background color
+    bg_color = placement_color
+    if bg_color.startswith('#'):
+        r = int(bg_color[1:3], 16)
+        g = int(bg_color[3:5], 16)
+        b = int(bg_color[5:7], 16)
+        bg_color = f'#{r//2:02x}{g//2:02x}{b//2:02x}'
+
+    box_size = 100  # Increased from 65 for larger text
+    box_x = 20
+    box_y = height//4  # Moved placement box and summoner icon further down
+
+    # Draw placement box
+    draw.rectangle([box_x, box_y, box_x + box_size, box_y + box_size], 
+                  fill=bg_color, outline=placement_color)
+    draw.rectangle([box_x+1, box_y+1, box_x + box_size-1, box_y + box_size-1], 
+                  outline=placement_color)
+
+    # Draw placement number
+    text = str(placement)
+    number_size = 60  # Size of the number
+    text_x = box_x + (box_size - number_size) // 2
+    text_y = box_y + (box_size - number_size) // 2
+    draw_number(draw, text, text_x, text_y, number_size, placement_color)
+
+    # Draw summoner icon
+    icon_size = 100  # Increased from 65 to match placement box
+    icon_x = box_x + box_size + 20
+    icon_y = box_y
+
+    # The round cutout is baked into the variant's alpha channel
+    icon_img = load_variant(images.get(assets['tactician_url']), TACTICIAN_VARIANT)
+    if icon_img:
+        try:
+            img.paste(icon_img, (icon_x, icon_y), icon_img)
+        except Exception as e:
+            print(f"Error processing summoner icon: {str(e)}")
+            draw.ellipse([icon_x, icon_y, icon_x + icon_size, icon_y + icon_size], fill='#2F3136')
+    else:
+        draw.ellipse([icon_x, icon_y, icon_x + icon_size, icon_y + icon_size], fill='#2F3136')
+
+    # Draw level
+    level_text = str(player_data['level'])
+    number_size = 30  # Smaller size for level number
+
+    circle_size = number_size + 12
+    circle_x = icon_x + icon_size - circle_size - 2
+    circle_y = icon_y + icon_size - circle_size - 2
+
+    draw.ellipse([circle_x, circle_y, circle_x + circle_size, circle_y + circle_size], 
+                 fill='#2F3136')
+    draw.ellipse([circle_x, circle_y, circle_x + circle_size, circle_y + circle_size], 
+                 outline='white', width=1)
+
+    # Draw level text
+    text_x = circle_x + (circle_size - number_size) // 2
+    text_y = circle_y + (circle_size - number_size) // 2
+    draw_number(draw, level_text, text_x, text_y, number_size, 'white')
+
+    # Draw units
+    unit_start_x = left_margin
+    y_pos = 30  # Reduced from 40 to bring units closer to summoner icon
+
+    for i, unit in enumerate(player_data['units']):
+        unit_stars = unit['tier']
+        items = unit.get('itemNames', [])
+        rarity = unit['rarity']
+
+        champ_img = load_variant(images.get(assets['champion_urls'][i]), CHAMPION_VARIANT)
+
+        if champ_img:
+            try:
+                x_pos = unit_start_x + (unit_width + unit_spacing) * i
+
+                # Draw stars
+                if unit_stars > 0:
+                    star_width = 44
+                    star_height = 17
+                    star_x = x_pos + (96 - star_width) // 2  # Adjusted for new champion size
+                    star_y = y_pos - star_height - 3
+                    if unit_stars in STAR_BADGES:
+                        badge, pad = STAR_BADGES[unit_stars]
+                        img.paste(badge, (star_x - pad, star_y - pad), badge)
+                    else:
+                        draw_star_background(draw, star_x, star_y, star_width, star_height, unit_stars)
+
+                # Draw champion border - gold for 3-star units, otherwise based on rarity
+                border_color = '#FFD700' if unit_stars == 3 else RARITY_COLORS.get(rarity, '#FFFFFF')
+                draw_bordered_rectangle(draw, x_pos-2, y_pos-2, 100, 100, border_color)  # Increased from 84x84
+
+                # Place champion (already 96x96, increased from 80x80)
+                img.paste(champ_img, (x_pos, y_pos))
+
+                # Draw items
+                if items:
+                    item_size = 32  # Increased from 25x25
+                    item_spacing = item_size + 2  # Add just 2 pixels of spacing between items
+                    item_y = y_pos + 96 - item_size + 3  # Added 3 pixels of padding at bottom
+                    # Calculate total width of items including gaps
+                    total_items_width = (item_size * len(items)) + ((len(items) - 1) * (item_spacing - item_size))
+                    # Center items by starting at half the remaining space
+                    item_x = x_pos + (96 - total_items_width) // 2 + 1  # Added 1 pixel to center
+                    for j, item_name in enumerate(items):
+                        item_img = load_variant(images.get(assets['item_urls'][i][j]), ITEM_VARIANT)
+
+                        if item_img:
+                            try:
+                                img.paste(item_img, (item_x + j * item_spacing, item_y))
+                            except Exception as e:
+                                print(f"Error processing item image {item_name}: {str(e)}")
+
+            except Exception as e:
+                print(f"Error processing unit {unit['character_id']}: {str(e)}")
+
+    # Draw traits
+    traits_y = y_pos + 110  # Adjusted for larger champion size
+    traits_x = left_margin  # Start traits from the same position as units
+    trait_spacing = 8  # Increased from 4
+    for trait in get_active_traits(player_data):
+        if traits_x + 48 + trait_spacing > width:  # Adjusted for new trait size
+            break
+
+        icon_img = load_variant(images.get(assets['trait_urls'].get(trait['name'])), TRAIT_VARIANT)
+        if draw_trait_icon(draw, img, traits_x, traits_y, icon_img, trait['name'], trait['style'], trait['num_units']):
+            traits_x += 48 + trait_spacing  # Adjusted for new trait size
+
+    # Encode and return image bytes
+    return encode_image(img, output)
+
+
+# Star badges, drawn once per worker and pasted onto every unit
+STAR_BADGES = build_star_badges()
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+
+
+class PortraitIndex:
+    """Maps TFT `character_id`s to their CommunityDragon portrait filenames.
+
+    The CommunityDragon directory listings are scraped once per set and patch,
+    persisted next to the asset cache and reused until the set or patch changes,
+    so resolving a portrait is a dictionary lookup.
+    """
+
+    base_url = "https://raw.communitydragon.org/latest/plugins/rcp-be-lol-game-data/global/default/assets/characters/{character}/skins/base/images/"
+
+    def __init__(self, http, cache_dir=None, concurrency=16):
+        self.http = http
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'shittytftbot', 'portraits')
+        self.concurrency = concurrency
+        self.set_number = None
+        self.version = None
+        self.filenames = {}
+
+    def index_path(self):
+        return os.path.join(self.cache_dir, f"portraits-set{self.set_number}-{self.version}.json")
+
+    def directory_url(self, character_id):
+        return self.base_url.format(character=character_id.lower())
+
+    def get(self, character_id):
+        """Get the full portrait URL for a unit, or None if it is not indexed"""
+        filename = self.filenames.get(character_id.lower())
+        return self.directory_url(character_id) + filename if filename else None
+
+    async def scrape(self, character_id):
+        """Find the portrait filename in a champion's communitydragon directory listing"""
+        character = character_id.lower()
+        try:
+            async with self.http.get(self.directory_url(character)) as response:
+                if response.status == 200:
+                    html = await response.text()
+                    # Look for .png files that contain the champion name
+                    matches = re.findall(f'{re.escape(character)}_.*?.png', html, re.IGNORECASE)
+                    if matches:
+                        return matches[0]
+            return None
+        except Exception as e:
+            print(f"Error getting champion image filename for {character_id}: {str(e)}")
+            return None
+
+    def save(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.index_path()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.filenames, f)
+            os.replace(tmp_path, self.index_path())
+        except OSError as e:
+            print(f"Failed to save portrait index: {e}")
+
+    def load_saved(self):
+        try:
+            with open(self.index_path(), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def remove_stale(self):
+        """Delete persisted indexes for other sets or patches"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        current = os.path.basename(self.index_path())
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith('portraits-') and entry.name != current:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    async def build(self, set_number, version, character_ids):
+        """Load or build the index for a set and patch"""
+        if (set_number, version) == (self.set_number, self.version):
+            return
+        self.set_number = set_number
+        self.version = version
+        self.remove_stale()
+
+        saved = self.load_saved()
+        if saved is not None:
+            self.filenames = saved
+            print(f"Loaded portrait index for set {set_number} ({len(saved)} champions)")
+            return
+
+        self.filenames = {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited(character_id):
+            async with semaphore:
+                return await self.scrape(character_id)
+
+        character_ids = [character_id.lower() for character_id in character_ids]
+        results = await asyncio.gather(*[limited(c) for c in character_ids])
+
+        self.filenames = {c: filename for c, filename in zip(character_ids, results) if filename}
+        self.save()
+        print(f"Built portrait index for set {set_number} ({len(self.filenames)}/{len(character_ids)} champions)")
+
+    async def resolve(self, character_id):
+        """Get the portrait URL, scraping and indexing the champion on a miss"""
+        url = self.get(character_id)
+        if url:
+            return url
+        filename = await self.scrape(character_id)
+        if not filename:
+            return None
+        self.filenames[character_id.lower()] = filename
+        if self.version is not None:
+            self.save()
+        return self.directory_url(character_id) + filename
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Token bucket for one Riot limit window, e.g. 100 requests per 120 seconds"""
+
+    def __init__(self, count, seconds):
+        self.capacity = count
+        self.seconds = seconds
+        self.rate = count / seconds
+        self.tokens = float(count)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def sync(self, used):
+        """Never assume more tokens are left than Riot says are left"""
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+def parse_limits(header):
+    """Parse a rate limit header like '20:1,100:120' into [(20, 1), (100, 120)]"""
+    limits = []
+    for part in (header or '').split(','):
+        if ':' in part:
+            count, seconds = part.split(':', 1)
+            try:
+                limits.append((int(count), int(seconds)))
+            except ValueError:
+                continue
+    return limits
+
+
+class RiotRateLimiter:
+    """Central limiter for Riot API calls.
+
+    Keeps application and per-method token buckets for every routing value
+    (americas, europe, na1, euw1, ...). Bucket sizes come from the
+    X-App-Rate-Limit / X-Method-Rate-Limit headers Riot sends back, the
+    matching -Count headers keep them in sync, and Retry-After on a 429
+    pauses the affected routing value.
+    """
+
+    def __init__(self, app_limits="20:1,100:120", method_limits=None):
+        self.default_app_limits = parse_limits(app_limits)
+        self.default_method_limits = parse_limits(method_limits) if method_limits else []
+        self.app_buckets = {}
+        self.method_buckets = {}
+        self.blocked_until = {}
+        self.locks = {}
+        self.throttled = 0
+
+    def buckets_for(self, routing, method):
+        if routing not in self.app_buckets:
+            self.app_buckets[routing] = [TokenBucket(count, seconds) for count, seconds in self.default_app_limits]
+        key = (routing, method)
+        if key not in self.method_buckets:
+            self.method_buckets[key] = [TokenBucket(count, seconds) for count, seconds in self.default_method_limits]
+        return self.app_buckets[routing] + self.method_buckets[key]
+
+    async def acquire(self, routing, method):
+        """Wait until a request to `method` on `routing` fits in every bucket, then take a token"""
+        lock = self.locks.setdefault(routing, asyncio.Lock())
+        while True:
+            # Only checking and taking tokens is locked; a method that is out of tokens
+            # sleeps outside it so other methods on the same routing value keep going
+            async with lock:
+                now = time.monotonic()
+                buckets = self.buckets_for(routing, method)
+                wait = max([bucket.wait_time(now) for bucket in buckets] +
+                           [self.blocked_until.get(routing, 0) - now, self.blocked_until.get((routing, method), 0) - now])
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.consume()
+                    return
+                self.throttled += 1
+            await asyncio.sleep(wait)
+
+    def resize(self, buckets, header):
+        """Rebuild buckets when Riot reports different limits than we are using"""
+        limits = parse_limits(header)
+        if not limits or [(b.capacity, b.seconds) for b in buckets] == limits:
+            return buckets
+        resized = []
+        for count, seconds in limits:
+            bucket = TokenBucket(count, seconds)
+            old = next((b for b in buckets if b.seconds == seconds), None)
+            if old:
+                bucket.tokens = min(count, old.tokens)
+            resized.append(bucket)
+        return resized
+
+    def sync_counts(self, buckets, header):
+        counts = {seconds: used for used, seconds in parse_limits(header)}
+        for bucket in buckets:
+            if bucket.seconds in counts:
+                bucket.sync(counts[bucket.seconds])
+
+    def update(self, routing, method, headers):
+        """Apply the rate limit headers from a Riot response"""
+        self.buckets_for(routing, method)
+        app_limit = headers.get('X-App-Rate-Limit')
+        method_limit = headers.get('X-Method-Rate-Limit')
+        if app_limit:
+            self.app_buckets[routing] = self.resize(self.app_buckets[routing], app_limit)
+            self.sync_counts(self.app_buckets[routing], headers.get('X-App-Rate-Limit-Count'))
+        if method_limit:
+            key = (routing, method)
+            self.method_buckets[key] = self.resize(self.method_buckets[key], method_limit)
+            self.sync_counts(self.method_buckets[key], headers.get('X-Method-Rate-Limit-Count'))
+
+    def on_rate_limited(self, routing, method, headers):
+        """Pause a routing value (or just one method on it) after a 429"""
+        try:
+            retry_after = float(headers.get('Retry-After', 1))
+        except ValueError:
+            retry_after = 1
+        limit_type = headers.get('X-Rate-Limit-Type', 'application')
+        key = (routing, method) if limit_type == 'method' else routing
+        self.blocked_until[key] = time.monotonic() + retry_after
+        print(f"Riot {limit_type} rate limit hit on {routing} ({method}), pausing for {retry_after}s")
+
+    def stats(self):
+        return {'throttled': self.throttled, 'routing_values': sorted(self.app_buckets)}
@@ -0,0 +1,110 @@
+import aiohttp
+import asyncio
+from urllib.parse import quote, urlparse
+
+
+class RiotAPIError(Exception):
+    """Raised when a Riot API (or tactics.tools) request does not return 200"""
+
+    def __init__(self, status, operation, body=None):
+        self.status = status
+        self.operation = operation
+        self.body = body
+        super().__init__(f"Failed {operation}: {status}")
+
+
+class RiotClient:
+    """Async Riot API client on top of the shared HTTP client.
+
+    Every call has a timeout so a slow Riot endpoint fails the command instead
+    of stalling the event loop, and every Riot call queues through the rate
+    limiter for its routing value.
+    """
+
+    def __init__(self, http, apikey, limiter, timeout=10, max_retries=3):
+        self.http = http
+        self.apikey = apikey
+        self.limiter = limiter
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.headers = {"X-Riot-Token": apikey}
+
+    @staticmethod
+    def account_region(region):
+        # For SEA region, we need to use asia region for account lookup
+        return 'asia' if region.lower() == 'sea' else region.lower()
+
+    async def get_json(self, url, operation, headers=None):
+        """GET a JSON document, raising RiotAPIError on any non-200 status"""
+        try:
+            async with self.http.get(url, headers=headers, timeout=self.timeout) as response:
+                if response.status != 200:
+                    body = await response.text()
+                    print(f"Failed {operation}. Status code: {response.status}")
+                    print(f"Response: {body}")
+                    raise RiotAPIError(response.status, operation, body)
+                return await response.json()
+        except asyncio.TimeoutError:
+            print(f"Timed out during {operation}")
+            raise RiotAPIError(408, operation)
+
+    async def request(self, url, operation):
+        """GET a Riot API endpoint through the rate limiter, retrying after a 429 or a timeout"""
+        # The routing value (americas, na1, ...) is the first label of the host
+        routing = urlparse(url).netloc.split('.')[0]
+        # Raised once every attempt failed: 429 if the last one was rate limited, 408 if it timed out
+        last_status = 429
+        for attempt in range(self.max_retries):
+            await self.limiter.acquire(routing, operation)
+            try:
+                async with self.http.get(url, headers=self.headers, timeout=self.timeout) as response:
+                    self.limiter.update(routing, operation, response.headers)
+                    if response.status == 429:
+                        self.limiter.on_rate_limited(routing, operation, response.headers)
+                        last_status = 429
+                        continue
+                    if response.status != 200:
+                        body = await response.text()
+                        print(f"Failed {operation}. Status code: {response.status}")
+                        print(f"Response: {body}")
+                        raise RiotAPIError(response.status, operation, body)
+                    return await response.json()
+            except asyncio.TimeoutError:
+                print(f"Timed out during {operation}, attempt {attempt + 1}")
+                last_status = 408
+        raise RiotAPIError(last_status, operation)
+
+    async def get_account_by_riot_id(self, name, tag, region):
+        url = f"https://{self.account_region(region)}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{quote(name)}/{quote(tag)}"
+        return await self.request(url, "PUUID lookup")
+
+    async def get_account_by_puuid(self, puuid, region='americas'):
+        url = f"https://{self.account_region(region)}.api.riotgames.com/riot/account/v1/accounts/by-puuid/{puuid}"
+        return await self.request(url, "account lookup")
+
+    async def get_tft_region(self, puuid, region):
+        """Get the TFT platform (na1, euw1, ...) a player is active on"""
+        url = f"https://{self.account_region(region)}.api.riotgames.com/riot/account/v1/region/by-game/tft/by-puuid/{puuid}"
+        data = await self.request(url, "region lookup")
+        return data['region'].lower()
+
+    async def get_league_entries(self, puuid, platform):
+        url = f"https://{platform}.api.riotgames.com/tft/league/v1/by-puuid/{puuid}"
+        return await self.request(url, "league data")
+
+    async def get_league(self, platform, tier):
+        """Get the challenger, grandmaster or master ladder for a platform"""
+        url = f"https://{platform}.api.riotgames.com/tft/league/v1/{tier}?queue=RANKED_TFT"
+        return await self.request(url, f"{tier} league")
+
+    async def get_summoner(self, platform, summoner_id):
+        url = f"https://{platform}.api.riotgames.com/tft/summoner/v1/summoners/{summoner_id}"
+        return await self.request(url, "summoner lookup")
+
+    async def get_match_ids(self, puuid, region, count=1):
+        url = f"https://{region}.api.riotgames.com/tft/match/v1/matches/by-puuid/{puuid}/ids?count={count}"
+        return await self.request(url, "match history")
+
+    async def get_match(self, match_id, region):
+        url = f"https://{region}.api.riotgames.com/tft/match/v1/matches/{match_id}"
+        return await self.request(url, "match details")
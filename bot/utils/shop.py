@@ -0,0 +1,116 @@
+import random
+import numpy as np
+
+
+class ShopSimulator:
+    """TFT shop engine with a shared champion bag.
+
+    Every champion starts with its tier's pool size in the bag. Each of the 5
+    shop slots picks a tier from the level's shop odds, then a champion weighted
+    by the copies of it left in the bag. Units shown in a shop are out of the
+    bag until the next refresh, and units that are bought stay out.
+    """
+
+    SHOP_SIZE = 5
+
+    def __init__(self, pools, pool_sizes, shop_odds):
+        # tier -> tuple of champion keys
+        self.pools = pools
+        self.pool_sizes = {int(tier): count for tier, count in pool_sizes.items()}
+        self.shop_odds = shop_odds
+        self.tiers = {name: tier for tier, names in pools.items() for name in names}
+
+    def odds_for(self, level):
+        """Chance of each tier (1-5) per shop slot at a level"""
+        odds = self.shop_odds[str(level)]
+        total = sum(odds)
+        return [chance / total for chance in odds]
+
+    def new_bag(self, taken=None):
+        """Copies left of every champion, with `taken` (champion -> copies) already out of the bag"""
+        taken = taken or {}
+        return {name: max(0, self.pool_sizes.get(tier, 0) - taken.get(name, 0)) for name, tier in self.tiers.items()}
+
+    def roll_fresh_shop(self, level):
+        """Roll one shop from a full bag without building one.
+
+        With every copy in the bag, champions of a tier are equally likely, so
+        this is five tier tickets drawn from the level's odds and a
+        random.choice per ticket.
+        """
+        odds = self.shop_odds[str(level)]
+        tiers = [1, 2, 3, 4, 5]
+        # Each tier's odds act as that many tickets; tiers without champions get none
+        counts = [odds[tier - 1] if self.pools.get(tier) else 0 for tier in tiers]
+        if not sum(counts):
+            return []
+        num_units = min(sum(counts), self.SHOP_SIZE)
+        return [random.choice(self.pools[tier]) for tier in random.sample(tiers, num_units, counts=counts)]
+
+    def roll_shop(self, level, bag):
+        """Roll one shop from `bag`. Returns up to 5 champion keys; `bag` is left as it was.
+
+        Use roll_fresh_shop when nothing has been taken out of the bag.
+        """
+        odds = self.odds_for(level)
+        shop = []
+        for _ in range(self.SHOP_SIZE):
+            tier_left = {tier: sum(bag[name] for name in names) for tier, names in self.pools.items()}
+            tiers = [tier for tier in range(1, 6) if tier_left.get(tier) and odds[tier - 1] > 0]
+            if not tiers:
+                break
+            tier = random.choices(tiers, weights=[odds[tier - 1] for tier in tiers])[0]
+            names = self.pools[tier]
+            name = random.choices(names, weights=[bag[name] for name in names])[0]
+            # Out of the bag while it sits in the shop
+            bag[name] -= 1
+            shop.append(name)
+
+        # Unbought units go back in the bag on refresh
+        for name in shop:
+            bag[name] += 1
+        return shop
+
+    def hit_odds(self, champion, level, copies_out=0, owned=0, rolls=30, target=9, trials=20000, seed=None):
+        """Estimate the chance of owning `target` copies of `champion` within `rolls` shops.
+
+        Runs `trials` independent games at once with NumPy. Every copy of the
+        champion that shows up is bought; other units of its tier that show up
+        are out of the bag until the next refresh. `copies_out` are copies held
+        by other players.
+
+        Returns the hit probability, the average number of shops it took when
+        it hit, and the average number of copies owned at the end.
+        """
+        tier = self.tiers[champion]
+        pool_size = self.pool_sizes[tier]
+        if copies_out + owned > pool_size:
+            raise ValueError(f"Only {pool_size} copies of a {tier}-cost exist")
+
+        tier_chance = self.odds_for(level)[tier - 1]
+        rng = np.random.default_rng(seed)
+
+        copies_left = np.full(trials, pool_size - copies_out - owned)
+        tier_left = np.full(trials, pool_size * len(self.pools[tier]) - copies_out - owned)
+        have = np.full(trials, owned)
+        hit_at = np.where(have >= target, 0, -1)
+
+        for shop in range(1, rolls + 1):
+            shown = np.zeros(trials, dtype=np.int64)
+            for _ in range(self.SHOP_SIZE):
+                available = tier_left - shown
+                in_tier = (rng.random(trials) < tier_chance) & (available > 0)
+                is_champion = rng.random(trials) * np.maximum(available, 1) < copies_left
+                bought = in_tier & is_champion & (have < target)
+                copies_left -= bought
+                tier_left -= bought
+                have += bought
+                shown += in_tier & ~is_champion
+            hit_at[(have >= target) & (hit_at < 0)] = shop
+
+        hits = hit_at >= 0
+        return {
+            'probability': float(hits.mean()),
+            'average_rolls': float(hit_at[hits].mean()) if hits.any() else None,
+            'expected_copies': float(have.mean())
+        }
@@ -0,0 +1,82 @@
+import asyncio
+from types import MappingProxyType
+
+
+class StaticDataRegistry:
+    """Data Dragon TFT data, downloaded and indexed once per patch.
+
+    Cogs get read-only views of each dataset instead of fetching the JSON
+    themselves on every command.
+    """
+
+    # dataset name -> (ddragon file, index entries by their 'id' field instead of the dict key)
+    DATASETS = {
+        'champions': ('tft-champion.json', True),
+        'traits': ('tft-trait.json', True),
+        'items': ('tft-item.json', True),
+        'tacticians': ('tft-tactician.json', False),
+        'regalia': ('tft-regalia.json', False),
+    }
+
+    def __init__(self, http, data_url):
+        self.http = http
+        self.data_url = data_url
+        self.version = None
+        self.data = {name: MappingProxyType({}) for name in self.DATASETS}
+        self.lock = asyncio.Lock()
+
+    @property
+    def champions(self):
+        return self.data['champions']
+
+    @property
+    def traits(self):
+        return self.data['traits']
+
+    @property
+    def items(self):
+        return self.data['items']
+
+    @property
+    def tacticians(self):
+        return self.data['tacticians']
+
+    @property
+    def regalia(self):
+        return self.data['regalia']
+
+    async def fetch_dataset(self, version, name):
+        filename, by_id = self.DATASETS[name]
+        url = self.data_url.format(version=version, file=filename)
+        try:
+            async with self.http.get(url) as response:
+                if response.status != 200:
+                    print(f"Failed to fetch {name} data: {response.status}")
+                    return None
+                payload = await response.json()
+        except Exception as e:
+            print(f"Error fetching {name} data: {str(e)}")
+            return None
+
+        entries = payload.get('data', {})
+        if by_id:
+            entries = {entry.get('id', key): entry for key, entry in entries.items()}
+        return MappingProxyType(entries)
+
+    async def load(self, version):
+        """Load every dataset for a patch. Does nothing if the patch is already loaded."""
+        async with self.lock:
+            if version == self.version:
+                return
+
+            results = await asyncio.gather(*[self.fetch_dataset(version, name) for name in self.DATASETS])
+
+            for name, result in zip(self.DATASETS, results):
+                if result is not None:
+                    self.data[name] = result
+
+            # Only mark the patch as loaded when everything came through, so a later call retries
+            if all(result is not None for result in results):
+                self.version = version
+            print(f"Loaded static data for patch {version}: " +
+                  ', '.join(f"{len(self.data[name])} {name}" for name in self.DATASETS))
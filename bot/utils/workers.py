@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def warm_up(_):
+    # Long enough that every worker has to pick one up, so all of them get started
+    time.sleep(0.05)
+
+
+class WorkerPool:
+    """Bounded thread or process pool for CPU-heavy work like Pillow rendering.
+
+    Jobs are plain functions that take and return picklable values (bytes, dicts),
+    so the same job runs in either kind of pool. Keeps counters for how many
+    jobs are waiting for a worker.
+
+    Process workers are forked, so call `start` while the bot is still
+    single-threaded; forking later, with database and resolver threads
+    running, can copy a held lock into a worker and deadlock it. Fork is used
+    even where it is not the default because main.py runs the bot at import
+    time, which spawn/forkserver workers would repeat.
+    """
+
+    def __init__(self, kind='process', max_workers=None):
+        if kind not in ('process', 'thread'):
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.executor = None
+        self.pending = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+
+    def get_executor(self):
+        if self.executor is None:
+            if self.kind == 'process':
+                context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def start(self):
+        """Create the executor and start every worker now instead of on the first job"""
+        executor = self.get_executor()
+        list(executor.map(warm_up, range(self.max_workers)))
+
+    @property
+    def queue_depth(self):
+        """Jobs submitted but not yet picked up by a worker"""
+        return max(0, self.pending - self.max_workers)
+
+    async def run(self, func, *args):
+        """Run `func(*args)` in the pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            result = await loop.run_in_executor(self.get_executor(), func, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'workers': self.max_workers,
+            'pending': self.pending,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'completed': self.completed,
+            'failed': self.failed
+        }